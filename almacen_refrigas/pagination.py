@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor (keyset) para todas las APIs.
+    El tamaño de página por defecto es REST_FRAMEWORK['PAGE_SIZE'] y el
+    cliente puede pedir otro con ?page_size= hasta max_page_size.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PaginacionTransacciones(PaginacionCursor):
+    ordering = ('-fecha', '-id')
@@ -0,0 +1,31 @@
+"""
+Utilidades compartidas por los tests de las apps.
+"""
+import re
+import unittest
+
+from django.db import connection
+
+
+class PlanConsultaMixin:
+    """
+    Aserciones sobre el plan de ejecución (EXPLAIN QUERY PLAN) de SQLite.
+    Sirven de regresión: si una consulta crítica deja de usar su índice,
+    el test falla en lugar de descubrirlo en producción con tablas grandes.
+    """
+
+    def assertUsaIndice(self, queryset, indice=None):
+        if connection.vendor != 'sqlite':
+            raise unittest.SkipTest('El plan de consulta solo se verifica en SQLite')
+
+        plan = queryset.explain()
+        tabla = queryset.model._meta.db_table
+
+        # "SCAN tabla" sin índice es un recorrido completo de la tabla
+        recorrido = re.search(
+            rf'SCAN {tabla}\b(?! USING (COVERING )?INDEX)', plan
+        )
+        self.assertIsNone(recorrido, f'Recorrido completo de {tabla}:\n{plan}')
+        self.assertIn(f'SEARCH {tabla}', plan)
+        if indice:
+            self.assertIn(indice, plan)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from decouple import config
 import dj_database_url
@@ -68,6 +69,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Base de pruebas en archivo (en el directorio temporal, una por
+        # proceso para no chocar con otra ejecución simultánea): la de
+        # memoria compartida rechaza escritores concurrentes en lugar de
+        # esperar (pruebas con hilos)
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), f'almacen_refrigas_test_{os.getpid()}.sqlite3'),
+        },
     }
 }
 
@@ -85,7 +93,34 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'almacen_refrigas.pagination.PaginacionCursor',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
+}
+
+# Server-Sent Events del tablero de caja (segundos)
+CAJA_EVENTOS_INTERVALO = config('CAJA_EVENTOS_INTERVALO', default=2, cast=float)
+CAJA_EVENTOS_DURACION = config('CAJA_EVENTOS_DURACION', default=300, cast=int)
+
+# Máximo de filas por importación masiva de transacciones
+CAJA_IMPORTACION_MAX_FILAS = config('CAJA_IMPORTACION_MAX_FILAS', default=20000, cast=int)
+
+# Caché: memoria local por defecto; CACHE_BACKEND/CACHE_LOCATION permiten usar
+# django.core.cache.backends.filebased.FileBasedCache compartida entre procesos
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='refrigas'),
+    }
 }
+# Segundos que se guardan las estadísticas de cartera (la versión las invalida antes)
+CARTERA_ESTADISTICAS_TTL = config('CARTERA_ESTADISTICAS_TTL', default=3600, cast=int)
+
+# Reportes generados en segundo plano
+REPORTES_DIR = config('REPORTES_DIR', default=str(BASE_DIR / 'reportes_generados'))
+# Con un worker externo (manage.py procesar_reportes) no se lanzan hilos por trabajo
+REPORTES_WORKER_EXTERNO = config('REPORTES_WORKER_EXTERNO', default=False, cast=bool)
+# Segundos sin señales de vida tras los que un trabajo pendiente o en proceso se da por perdido
+REPORTES_TRABAJO_TIMEOUT = config('REPORTES_TRABAJO_TIMEOUT', default=600, cast=int)
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
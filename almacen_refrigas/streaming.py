@@ -0,0 +1,33 @@
+"""
+Respuestas en streaming que funcionan igual bajo WSGI y ASGI.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+# Partes que se leen por cada salto al hilo síncrono
+TAMANO_LOTE = 200
+
+
+async def _iterar_en_lotes(iterador, tamano):
+    iterador = iter(iterador)
+    # thread_sensitive: el cursor del .iterator() se usa siempre desde el mismo hilo
+    siguiente_lote = sync_to_async(lambda: list(islice(iterador, tamano)), thread_sensitive=True)
+    while True:
+        lote = await siguiente_lote()
+        if not lote:
+            return
+        for parte in lote:
+            yield parte
+
+
+def contenido_streaming(request, iterador, tamano=TAMANO_LOTE):
+    """
+    Adapta un iterador síncrono para StreamingHttpResponse. Bajo ASGI Django
+    consume los iteradores síncronos completos en memoria antes de enviarlos;
+    aquí se convierten en uno asíncrono que avanza por lotes.
+    """
+    if isinstance(request, ASGIRequest):
+        return _iterar_en_lotes(iterador, tamano)
+    return iterador
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaccion, CierreCaja
+from .models import Transaccion, CierreCaja, TotalDiarioCaja
 
 
 
@@ -15,4 +15,15 @@ class CierreCajaAdmin(admin.ModelAdmin):
 class TransaccionAdmin(admin.ModelAdmin):
     list_display = ['fecha', 'tipo', 'monto', 'descripcion', 'numero_factura', 'usuario']
     list_filter = ['tipo', 'fecha', 'usuario']
-    search_fields = ['descripcion', 'numero_factura']
\ No newline at end of file
+    search_fields = ['descripcion', 'numero_factura']
+
+@admin.register(TotalDiarioCaja)
+class TotalDiarioCajaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'tipo', 'total', 'cantidad']
+    list_filter = ['tipo', 'fecha']
+    ordering = ['-fecha', 'tipo']
+    readonly_fields = ['fecha', 'tipo', 'total', 'cantidad']
+
+    def has_add_permission(self, request):
+        # Derivado de las transacciones; se regenera con reconstruir_totales_caja
+        return False
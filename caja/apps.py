@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CajaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'caja'
-    verbose_name = 'Módulo de Caja'
\ No newline at end of file
+    verbose_name = 'Módulo de Caja'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime
+from caja.services import CajaService
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla TotalDiarioCaja a partir de las transacciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        desde = options['desde']
+        hasta = options['hasta']
+
+        if desde:
+            desde = datetime.strptime(desde, '%Y-%m-%d').date()
+        if hasta:
+            hasta = datetime.strptime(hasta, '%Y-%m-%d').date()
+
+        self.stdout.write(self.style.WARNING('Reconstruyendo totales diarios de caja...'))
+
+        filas = CajaService.reconstruir_totales(fecha_inicio=desde, fecha_fin=hasta)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Totales reconstruidos: {len(filas)} filas (fecha, tipo)'
+        ))
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:13
+
+from datetime import datetime, timezone as dt_timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+import django.utils.timezone
+
+
+def normalizar_fechas(apps, schema_editor):
+    """
+    fecha fue DateTimeField. En SQLite el AlterField de 0002 no convirtió los
+    valores ya guardados ('2025-09-27 20:23:01.644775', en UTC), que como
+    DateField se leen como None. Se reemplazan por su fecha local.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    tabla = apps.get_model('caja', 'Transaccion')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT id, CAST(fecha AS TEXT) FROM {tabla} WHERE length(fecha) > 10')
+        for id_, valor in cursor.fetchall():
+            momento = datetime.fromisoformat(valor)
+            if momento.tzinfo is None:
+                momento = momento.replace(tzinfo=dt_timezone.utc)
+            cursor.execute(
+                f'UPDATE {tabla} SET fecha = %s WHERE id = %s',
+                [timezone.localdate(momento).isoformat(), id_]
+            )
+
+
+def poblar_totales(apps, schema_editor):
+    Transaccion = apps.get_model('caja', 'Transaccion')
+    TotalDiarioCaja = apps.get_model('caja', 'TotalDiarioCaja')
+
+    agrupadas = Transaccion.objects.order_by().values('fecha', 'tipo').annotate(
+        total=Sum('monto'), cantidad=Count('id')
+    )
+    TotalDiarioCaja.objects.bulk_create(
+        [TotalDiarioCaja(**fila) for fila in agrupadas.iterator()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0002_alter_transaccion_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TotalDiarioCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('VF', 'Venta Facturada'), ('VNF', 'Venta No Facturada'), ('IO', 'Otro Ingreso')], max_length=3)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Total Diario de Caja',
+                'verbose_name_plural': 'Totales Diarios de Caja',
+                'ordering': ['-fecha', 'tipo'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='transaccion',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddConstraint(
+            model_name='totaldiariocaja',
+            constraint=models.UniqueConstraint(fields=('fecha', 'tipo'), name='total_diario_caja_fecha_tipo'),
+        ),
+        migrations.RunPython(normalizar_fechas, migrations.RunPython.noop),
+        migrations.RunPython(poblar_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0003_totaldiariocaja'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Versión de Caja',
+                'verbose_name_plural': 'Versiones de Caja',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0004_versioncaja'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['fecha', 'tipo'], name='transaccion_fecha_tipo_idx'),
+        ),
+    ]
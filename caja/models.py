@@ -1,9 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
-from django.db.models.functions import TruncDate
 
 class TipoTransaccion(models.TextChoices):
     VENTA_FACTURADA = 'VF', 'Venta Facturada'
@@ -31,10 +31,108 @@ class Transaccion(models.Model):
         ordering = ['-fecha']
         verbose_name = 'Transacción'
         verbose_name_plural = 'Transacciones'
+        indexes = [
+            models.Index(fields=['fecha', 'tipo'], name='transaccion_fecha_tipo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - ${self.monto} ({self.fecha.strftime('%Y-%m-%d %H:%M')})"
 
+    def save(self, *args, **kwargs):
+        self.monto = self._meta.get_field('monto').to_python(self.monto)
+        with transaction.atomic():
+            anterior = None
+            if not self._state.adding:
+                anterior = Transaccion.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('fecha', 'tipo', 'monto').first()
+
+            super().save(*args, **kwargs)
+
+            VersionCaja.incrementar(self.fecha)
+            if anterior is not None and anterior['fecha'] != self.fecha:
+                VersionCaja.incrementar(anterior['fecha'])
+
+            if anterior is None:
+                TotalDiarioCaja.aplicar(self.fecha, self.tipo, self.monto, 1)
+            elif (anterior['fecha'], anterior['tipo']) == (self.fecha, self.tipo):
+                TotalDiarioCaja.aplicar(self.fecha, self.tipo, self.monto - anterior['monto'], 0)
+            else:
+                TotalDiarioCaja.aplicar(anterior['fecha'], anterior['tipo'], -anterior['monto'], -1)
+                TotalDiarioCaja.aplicar(self.fecha, self.tipo, self.monto, 1)
+
+    def delete(self, *args, **kwargs):
+        # TotalDiarioCaja y VersionCaja se ajustan en la señal post_delete
+        # (caja/signals.py), que también cubre borrados masivos y en cascada.
+        # Aquí solo se asegura que descuente los valores guardados.
+        with transaction.atomic():
+            anterior = Transaccion.objects.select_for_update().filter(
+                pk=self.pk
+            ).values('fecha', 'tipo', 'monto').first()
+            if anterior is None:
+                return 0, {}
+
+            self.fecha, self.tipo, self.monto = anterior['fecha'], anterior['tipo'], anterior['monto']
+            return super().delete(*args, **kwargs)
+
+
+class TotalDiarioCaja(models.Model):
+    """
+    Totales de caja precalculados por día y tipo de transacción.
+    Se mantienen con incrementos F() desde Transaccion.save() y la señal post_delete;
+    el comando reconstruir_totales_caja los regenera a partir de las transacciones.
+    """
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=3, choices=TipoTransaccion.choices)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-fecha', 'tipo']
+        verbose_name = 'Total Diario de Caja'
+        verbose_name_plural = 'Totales Diarios de Caja'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'tipo'], name='total_diario_caja_fecha_tipo'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.get_tipo_display()} - ${self.total}"
+
+    @staticmethod
+    def aplicar(fecha, tipo, delta_total, delta_cantidad):
+        """Suma los deltas a la fila (fecha, tipo), creándola si no existe."""
+        TotalDiarioCaja.objects.get_or_create(fecha=fecha, tipo=tipo)
+        TotalDiarioCaja.objects.filter(fecha=fecha, tipo=tipo).update(
+            total=F('total') + delta_total,
+            cantidad=F('cantidad') + delta_cantidad
+        )
+
+
+class VersionCaja(models.Model):
+    """
+    Contador de cambios de caja por día. Se incrementa en cada escritura de
+    Transaccion o CierreCaja y sirve para generar ETag/Last-Modified sin
+    consultar ni serializar los datos.
+    """
+    fecha = models.DateField(unique=True)
+    version = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Versión de Caja'
+        verbose_name_plural = 'Versiones de Caja'
+
+    def __str__(self):
+        return f"{self.fecha} v{self.version}"
+
+    @staticmethod
+    def incrementar(fecha):
+        VersionCaja.objects.get_or_create(fecha=fecha)
+        VersionCaja.objects.filter(fecha=fecha).update(
+            version=F('version') + 1,
+            actualizado=timezone.now()
+        )
+
 
 class CierreCaja(models.Model):
     fecha = models.DateField(unique=True)
@@ -56,31 +154,21 @@ class CierreCaja(models.Model):
     
     def __str__(self):
         return f"Cierre {self.fecha} - ${self.total_calculado}"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            VersionCaja.incrementar(self.fecha)
     
     def calcular_totales(self):
-        from django.db.models import Sum
-
-        transacciones_del_dia = Transaccion.objects.annotate(
-            fecha_local=TruncDate('fecha', tzinfo=timezone.get_current_timezone())
-        ).filter(fecha_local=self.fecha)
+        from .services import CajaService
 
-        self.total_ventas_facturadas = transacciones_del_dia.filter(
-            tipo=TipoTransaccion.VENTA_FACTURADA
-        ).aggregate(Sum('monto'))['monto__sum'] or Decimal('0.00')
+        totales = CajaService.totales_del_dia(self.fecha)
 
-        self.total_ventas_no_facturadas = transacciones_del_dia.filter(
-            tipo=TipoTransaccion.VENTA_NO_FACTURADA
-        ).aggregate(Sum('monto'))['monto__sum'] or Decimal('0.00')
-
-        self.total_otros_ingresos = transacciones_del_dia.filter(
-            tipo=TipoTransaccion.INGRESO_OTRO
-        ).aggregate(Sum('monto'))['monto__sum'] or Decimal('0.00')
-
-        self.total_calculado = (
-            self.total_ventas_facturadas +
-            self.total_ventas_no_facturadas +
-            self.total_otros_ingresos
-        )
+        self.total_ventas_facturadas = totales['ventas_facturadas']
+        self.total_ventas_no_facturadas = totales['ventas_no_facturadas']
+        self.total_otros_ingresos = totales['otros_ingresos']
+        self.total_calculado = totales['total']
 
         if self.total_fisico is not None:
             self.diferencia = self.total_fisico - self.total_calculado
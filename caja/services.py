@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from decimal import Decimal
+from .models import Transaccion, TipoTransaccion, TotalDiarioCaja, VersionCaja
+from .serializers import TransaccionSerializer
+
+
+class CajaService:
+
+    # Nombre del total en la respuesta para cada tipo de transacción
+    CAMPOS_POR_TIPO = {
+        TipoTransaccion.VENTA_FACTURADA: 'ventas_facturadas',
+        TipoTransaccion.VENTA_NO_FACTURADA: 'ventas_no_facturadas',
+        TipoTransaccion.INGRESO_OTRO: 'otros_ingresos',
+    }
+
+    @staticmethod
+    def totales_del_dia(fecha):
+        """
+        Devuelve la suma y la cantidad de transacciones de cada tipo para la
+        fecha indicada, leyendo las filas precalculadas de TotalDiarioCaja.
+        """
+        totales = {'total_transacciones': 0}
+        for campo in CajaService.CAMPOS_POR_TIPO.values():
+            totales[campo] = Decimal('0.00')
+            totales[f'cantidad_{campo}'] = 0
+
+        for fila in TotalDiarioCaja.objects.filter(fecha=fecha).order_by().values('tipo', 'total', 'cantidad'):
+            campo = CajaService.CAMPOS_POR_TIPO[fila['tipo']]
+            totales[campo] = fila['total']
+            totales[f'cantidad_{campo}'] = fila['cantidad']
+            totales['total_transacciones'] += fila['cantidad']
+
+        totales['total'] = sum(
+            (totales[campo] for campo in CajaService.CAMPOS_POR_TIPO.values()),
+            Decimal('0.00')
+        )
+        return totales
+
+    @staticmethod
+    def reconstruir_totales(fecha_inicio=None, fecha_fin=None):
+        """
+        Regenera TotalDiarioCaja a partir de las transacciones con una
+        consulta agrupada por (fecha, tipo). Devuelve las filas creadas.
+        """
+        transacciones = Transaccion.objects.all()
+        totales = TotalDiarioCaja.objects.all()
+
+        if fecha_inicio:
+            transacciones = transacciones.filter(fecha__gte=fecha_inicio)
+            totales = totales.filter(fecha__gte=fecha_inicio)
+        if fecha_fin:
+            transacciones = transacciones.filter(fecha__lte=fecha_fin)
+            totales = totales.filter(fecha__lte=fecha_fin)
+
+        agrupadas = transacciones.order_by().values('fecha', 'tipo').annotate(
+            total=Sum('monto'),
+            cantidad=Count('id')
+        )
+
+        with transaction.atomic():
+            totales.delete()
+            filas = TotalDiarioCaja.objects.bulk_create(
+                [TotalDiarioCaja(**fila) for fila in agrupadas.iterator()],
+                batch_size=1000
+            )
+
+            # Invalidar los ETag de los días reconstruidos
+            fechas = {fila.fecha for fila in filas}
+            VersionCaja.objects.bulk_create(
+                [VersionCaja(fecha=fecha) for fecha in fechas],
+                ignore_conflicts=True
+            )
+            versiones = VersionCaja.objects.all()
+            if fecha_inicio:
+                versiones = versiones.filter(fecha__gte=fecha_inicio)
+            if fecha_fin:
+                versiones = versiones.filter(fecha__lte=fecha_fin)
+            versiones.update(version=F('version') + 1, actualizado=timezone.now())
+
+        return filas
+
+    @staticmethod
+    def importar_transacciones(filas, usuario, tamano_lote=500):
+        """
+        Valida las filas por lotes con TransaccionSerializer(many=True) y, si
+        todas son válidas, las inserta con bulk_create en una sola transacción.
+        Devuelve (creadas, errores); errores es una lista de
+        {'fila': índice, 'errores': {...}} y si no está vacía no se inserta nada.
+        """
+        validas = []
+        errores = []
+
+        for inicio in range(0, len(filas), tamano_lote):
+            lote = filas[inicio:inicio + tamano_lote]
+            serializer = TransaccionSerializer(data=lote, many=True)
+            if serializer.is_valid():
+                validas.extend(serializer.validated_data)
+                continue
+            for posicion, error in enumerate(serializer.errors):
+                if error:
+                    errores.append({'fila': inicio + posicion, 'errores': error})
+
+        if errores:
+            return [], errores
+
+        transacciones = [Transaccion(usuario=usuario, **datos) for datos in validas]
+
+        # Deltas agregados por (fecha, tipo): bulk_create no pasa por Transaccion.save()
+        deltas = {}
+        for t in transacciones:
+            total, cantidad = deltas.get((t.fecha, t.tipo), (Decimal('0.00'), 0))
+            deltas[(t.fecha, t.tipo)] = (total + t.monto, cantidad + 1)
+
+        with transaction.atomic():
+            creadas = Transaccion.objects.bulk_create(transacciones, batch_size=1000)
+            for (fecha, tipo), (total, cantidad) in sorted(deltas.items()):
+                TotalDiarioCaja.aplicar(fecha, tipo, total, cantidad)
+            for fecha in sorted({fecha for fecha, _ in deltas}):
+                VersionCaja.incrementar(fecha)
+
+        return creadas, []
+
+    @staticmethod
+    def version_del_dia(fecha):
+        """Devuelve (version, actualizado) de la fecha; (0, None) si nunca cambió."""
+        fila = VersionCaja.objects.filter(fecha=fecha).values_list('version', 'actualizado').first()
+        return fila or (0, None)
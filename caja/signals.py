@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CierreCaja, TotalDiarioCaja, Transaccion, VersionCaja
+
+
+@receiver(post_delete, sender=Transaccion)
+def descontar_transaccion(sender, instance, **kwargs):
+    """
+    Descuenta la transacción borrada de TotalDiarioCaja e incrementa la
+    versión de su día. Se emite también en QuerySet.delete() y en los borrados
+    en cascada (p. ej. al eliminar el usuario), que no pasan por
+    Transaccion.delete(). Corre dentro de la transacción del borrado.
+    """
+    TotalDiarioCaja.aplicar(instance.fecha, instance.tipo, -instance.monto, -1)
+    VersionCaja.incrementar(instance.fecha)
+
+
+@receiver(post_delete, sender=CierreCaja)
+def invalidar_cierre(sender, instance, **kwargs):
+    VersionCaja.incrementar(instance.fecha)
@@ -0,0 +1,365 @@
+from decimal import Decimal
+from datetime import date
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from almacen_refrigas.pruebas import PlanConsultaMixin
+
+from .models import Transaccion, CierreCaja, TipoTransaccion, TotalDiarioCaja, VersionCaja
+from .services import CajaService
+from .views import VigilanteVersionCaja
+
+
+class TotalesCajaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cajero', password='cajero123')
+        cls.fecha = date(2026, 3, 31)
+
+        movimientos = [
+            (TipoTransaccion.VENTA_FACTURADA, '150000'),
+            (TipoTransaccion.VENTA_FACTURADA, '85000'),
+            (TipoTransaccion.VENTA_NO_FACTURADA, '25000'),
+            (TipoTransaccion.INGRESO_OTRO, '50000'),
+        ]
+        for tipo, monto in movimientos:
+            Transaccion.objects.create(
+                fecha=cls.fecha, tipo=tipo, monto=Decimal(monto),
+                descripcion='Prueba', usuario=cls.usuario
+            )
+        # Otro día: no debe sumarse
+        Transaccion.objects.create(
+            fecha=date(2026, 4, 1), monto=Decimal('999'),
+            descripcion='Prueba', usuario=cls.usuario
+        )
+
+    def test_totales_del_dia_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            totales = CajaService.totales_del_dia(self.fecha)
+
+        self.assertEqual(totales['ventas_facturadas'], Decimal('235000'))
+        self.assertEqual(totales['ventas_no_facturadas'], Decimal('25000'))
+        self.assertEqual(totales['otros_ingresos'], Decimal('50000'))
+        self.assertEqual(totales['total'], Decimal('310000'))
+        self.assertEqual(totales['total_transacciones'], 4)
+        self.assertEqual(totales['cantidad_ventas_facturadas'], 2)
+
+    def test_dia_sin_transacciones(self):
+        totales = CajaService.totales_del_dia(date(2026, 1, 1))
+
+        self.assertEqual(totales['total'], Decimal('0.00'))
+        self.assertEqual(totales['total_transacciones'], 0)
+
+    def test_resumen_diario(self):
+        self.client.force_login(self.usuario)
+
+        with self.assertNumQueries(4):  # sesión, usuario, versión y totales
+            respuesta = self.client.get(
+                '/api/transacciones/resumen_diario/', {'fecha': '2026-03-31'}
+            )
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Decimal(respuesta.json()['total']), Decimal('310000'))
+
+    def test_calcular_totales_cierre(self):
+        cierre = CierreCaja.objects.create(fecha=self.fecha, total_fisico=Decimal('300000'))
+
+        with self.assertNumQueries(6):  # totales, guardado y versión (con savepoint)
+            cierre.calcular_totales()
+
+        self.assertEqual(cierre.total_calculado, Decimal('310000'))
+        self.assertEqual(cierre.diferencia, Decimal('-10000'))
+
+
+class TotalDiarioCajaTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+        self.fecha = date(2026, 3, 31)
+
+    def crear(self, monto, tipo=TipoTransaccion.VENTA_FACTURADA, fecha=None):
+        return Transaccion.objects.create(
+            fecha=fecha or self.fecha, tipo=tipo, monto=Decimal(monto),
+            descripcion='Prueba', usuario=self.usuario
+        )
+
+    def total(self, fecha, tipo):
+        return TotalDiarioCaja.objects.get(fecha=fecha, tipo=tipo)
+
+    def test_crear_editar_y_borrar(self):
+        transaccion = self.crear('100')
+        self.crear('50')
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('150'))
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 2)
+
+        transaccion.monto = Decimal('70')
+        transaccion.save()
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('120'))
+
+        transaccion.delete()
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('50'))
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 1)
+
+    def test_monto_como_texto(self):
+        transaccion = Transaccion.objects.create(
+            fecha=self.fecha, monto='100', descripcion='Prueba', usuario=self.usuario
+        )
+        transaccion.monto = '70.50'
+        transaccion.save()
+        self.assertEqual(transaccion.monto, Decimal('70.50'))
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('70.50'))
+
+    def test_borrado_masivo_y_en_cascada(self):
+        self.crear('100')
+        self.crear('40', tipo=TipoTransaccion.VENTA_NO_FACTURADA)
+        otro = User.objects.create_user('temporal', password='temporal123')
+        Transaccion.objects.create(
+            fecha=self.fecha, monto=Decimal('30'), descripcion='Prueba', usuario=otro
+        )
+        version = VersionCaja.objects.get(fecha=self.fecha).version
+
+        otro.delete()
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('100'))
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 1)
+        self.assertGreater(VersionCaja.objects.get(fecha=self.fecha).version, version)
+
+        Transaccion.objects.filter(tipo=TipoTransaccion.VENTA_FACTURADA).delete()
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('0'))
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 0)
+        self.assertEqual(CajaService.totales_del_dia(self.fecha)['total'], Decimal('40'))
+
+    def test_borrar_con_valores_en_memoria_desactualizados(self):
+        transaccion = self.crear('100')
+        copia = Transaccion.objects.get(pk=transaccion.pk)
+
+        transaccion.monto = Decimal('5')
+        transaccion.delete()
+        self.assertEqual(self.total(self.fecha, 'VF').total, Decimal('0'))
+
+        # Una copia ya borrada no vuelve a descontar
+        self.assertEqual(copia.delete(), (0, {}))
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 0)
+
+    def test_cambio_de_fecha_y_tipo(self):
+        transaccion = self.crear('100')
+        otra_fecha = date(2026, 4, 1)
+
+        transaccion.fecha = otra_fecha
+        transaccion.tipo = TipoTransaccion.INGRESO_OTRO
+        transaccion.save()
+
+        self.assertEqual(self.total(self.fecha, 'VF').cantidad, 0)
+        self.assertEqual(self.total(otra_fecha, 'IO').total, Decimal('100'))
+        self.assertEqual(CajaService.totales_del_dia(otra_fecha)['otros_ingresos'], Decimal('100'))
+
+    def test_reconstruir_totales(self):
+        self.crear('100')
+        self.crear('40', tipo=TipoTransaccion.VENTA_NO_FACTURADA)
+        TotalDiarioCaja.objects.all().delete()
+
+        call_command('reconstruir_totales_caja', stdout=StringIO())
+
+        totales = CajaService.totales_del_dia(self.fecha)
+        self.assertEqual(totales['total'], Decimal('140'))
+        self.assertEqual(totales['total_transacciones'], 2)
+
+
+class PaginacionTransaccionesTests(TestCase):
+
+    def test_orden_por_fecha_descendente_e_id(self):
+        usuario = User.objects.create_user('cajero', password='cajero123')
+        for dia in (1, 3, 2, 3):
+            Transaccion.objects.create(
+                fecha=date(2026, 3, dia), monto=Decimal('10'),
+                descripcion=f'Dia {dia}', usuario=usuario
+            )
+        self.client.force_login(usuario)
+
+        datos = self.client.get('/api/transacciones/', {'page_size': 3}).json()
+        ids = [t['id'] for t in datos['results']]
+        datos = self.client.get(datos['next']).json()
+        ids += [t['id'] for t in datos['results']]
+
+        esperado = list(Transaccion.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, esperado)
+        self.assertIsNone(datos['next'])
+
+
+class GetCondicionalCajaTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+        self.client.force_login(self.usuario)
+        self.crear()
+
+    def crear(self):
+        return Transaccion.objects.create(
+            fecha=date(2026, 3, 31), monto=Decimal('10'),
+            descripcion='Prueba', usuario=self.usuario
+        )
+
+    def test_etag_y_304_en_endpoints_sondeados(self):
+        urls = [
+            '/api/transacciones/resumen_diario/?fecha=2026-03-31',
+            '/api/transacciones/?fecha=2026-03-31',
+            '/api/cierres/?fecha=2026-03-31',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                etag = respuesta['ETag']
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertIn('no-cache', respuesta['Cache-Control'])
+
+                with self.assertNumQueries(3):  # sesión, usuario y versión
+                    respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(respuesta.status_code, 304)
+
+    def test_cambio_invalida_etag(self):
+        url = '/api/transacciones/resumen_diario/?fecha=2026-03-31'
+        etag = self.client.get(url)['ETag']
+
+        self.crear()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+        CierreCaja.objects.create(fecha=date(2026, 3, 31))
+        self.assertNotEqual(self.client.get(url)['ETag'], respuesta['ETag'])
+
+    def test_sin_fecha_no_hay_etag(self):
+        respuesta = self.client.get('/api/transacciones/')
+        self.assertFalse(respuesta.has_header('ETag'))
+
+
+# La versión se consulta desde el hilo compartido del vigilante, con su propia
+# conexión: los datos de prueba deben estar confirmados
+@override_settings(CAJA_EVENTOS_INTERVALO=0, CAJA_EVENTOS_DURACION=5)
+class EventosCajaTests(TransactionTestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+
+    async def abrir_flujo(self):
+        respuesta = await self.async_client.get('/api/caja/eventos/')
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+
+        flujo = respuesta.streaming_content.__aiter__()
+        self.assertTrue((await anext(flujo)).startswith(b'retry:'))
+        self.assertTrue((await anext(flujo)).startswith(b'id: '))
+        return flujo
+
+    async def test_evento_al_cambiar_transacciones(self):
+        await sync_to_async(self.async_client.force_login)(self.usuario)
+        flujo = await self.abrir_flujo()
+
+        await sync_to_async(Transaccion.objects.create)(
+            monto=Decimal('10'), descripcion='Prueba', usuario=self.usuario
+        )
+        evento = (await anext(flujo)).decode()
+        self.assertIn('event: caja', evento)
+        self.assertIn('"version": 1', evento)
+
+    async def test_flujos_comparten_una_consulta(self):
+        await sync_to_async(self.async_client.force_login)(self.usuario)
+        flujos = [await self.abrir_flujo() for _ in range(3)]
+
+        vigilante = VigilanteVersionCaja.del_proceso()
+        self.assertEqual(vigilante.suscriptores, 3)
+        tarea = vigilante.tarea
+
+        await sync_to_async(Transaccion.objects.create)(
+            monto=Decimal('10'), descripcion='Prueba', usuario=self.usuario
+        )
+        for flujo in flujos:
+            self.assertIn('"version": 1', (await anext(flujo)).decode())
+        self.assertIs(vigilante.tarea, tarea)
+
+    async def test_requiere_autenticacion(self):
+        respuesta = await self.async_client.get('/api/caja/eventos/')
+        self.assertEqual(respuesta.status_code, 401)
+
+    def test_bajo_wsgi_responde_204(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get('/api/caja/eventos/').status_code, 204)
+
+
+class ImportacionMasivaTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+        self.client.force_login(self.usuario)
+
+    def filas(self, cantidad):
+        return [
+            {'fecha': '2026-03-31', 'tipo': 'VF', 'monto': '1000.00',
+             'descripcion': f'Venta {i}', 'numero_factura': f'F{i}'}
+            for i in range(cantidad)
+        ]
+
+    def test_importar_json_en_pocas_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(
+                '/api/transacciones/bulk/', self.filas(300), content_type='application/json'
+            )
+
+        self.assertLess(len(consultas), 20)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['creadas'], 300)
+        totales = CajaService.totales_del_dia(date(2026, 3, 31))
+        self.assertEqual(totales['ventas_facturadas'], Decimal('300000'))
+        self.assertEqual(totales['total_transacciones'], 300)
+
+    def test_errores_por_fila_no_importan_nada(self):
+        filas = self.filas(3)
+        filas[1]['monto'] = '-5'
+        filas[2]['tipo'] = 'XX'
+
+        respuesta = self.client.post(
+            '/api/transacciones/bulk/', filas, content_type='application/json'
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['fila'] for e in respuesta.json()['errores']], [1, 2])
+        self.assertFalse(Transaccion.objects.exists())
+
+    def test_importar_csv(self):
+        contenido = (
+            'fecha,tipo,monto,descripcion,numero_factura\n'
+            '2026-03-31,VF,1500,Venta nevera,F001\n'
+            '2026-03-31,VNF,200,Servicio técnico,\n'
+        ).encode('utf-8')
+        archivo = SimpleUploadedFile('ventas.csv', contenido, content_type='text/csv')
+
+        respuesta = self.client.post('/api/transacciones/bulk/', {'archivo': archivo})
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['creadas'], 2)
+        self.assertIsNone(Transaccion.objects.get(tipo='VNF').numero_factura)
+
+
+class PlanesDeConsultaTests(PlanConsultaMixin, TestCase):
+
+    def test_transacciones_por_fecha_y_tipo(self):
+        hoy = date.today()
+        self.assertUsaIndice(
+            Transaccion.objects.filter(fecha=hoy).order_by('-fecha', '-id'),
+            'transaccion_fecha_tipo_idx'
+        )
+        self.assertUsaIndice(
+            Transaccion.objects.filter(fecha__range=(hoy, hoy), tipo=TipoTransaccion.VENTA_FACTURADA),
+            'transaccion_fecha_tipo_idx'
+        )
+
+    def test_totales_y_version_del_dia(self):
+        hoy = date.today()
+        self.assertUsaIndice(TotalDiarioCaja.objects.filter(fecha=hoy))
+        self.assertUsaIndice(VersionCaja.objects.filter(fecha=hoy))
@@ -7,5 +7,6 @@ router.register(r'transacciones', views.TransaccionViewSet, basename='transaccio
 router.register(r'cierres', views.CierreCajaViewSet, basename='cierres')
 
 urlpatterns = [
+    path('caja/eventos/', views.eventos_caja, name='eventos_caja'),
     path('', include(router.urls)),
 ]
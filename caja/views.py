@@ -1,19 +1,84 @@
 import pytz
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum
-from django.db.models.functions import TruncDate
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from datetime import datetime, time
-from .models import Transaccion, CierreCaja, TipoTransaccion
+from functools import wraps
+import asyncio
+import contextvars
+import csv
+import hashlib
+import io
+import json
+import weakref
+from .models import Transaccion, CierreCaja, TipoTransaccion, VersionCaja
 from .serializers import TransaccionSerializer, CierreCajaSerializer
+from .services import CajaService
+from almacen_refrigas.pagination import PaginacionTransacciones
+
+
+def condicional_por_fecha(por_defecto_hoy=False):
+    """
+    GET condicional (ETag / Last-Modified) para endpoints filtrados por ?fecha=.
+    Ambos se derivan de VersionCaja con una sola consulta indexada, así que
+    un 304 no ejecuta la vista ni serializa nada. Sin fecha no aplica.
+    """
+    def version(request):
+        if not hasattr(request, '_version_caja'):
+            fecha = None
+            try:
+                fecha = datetime.strptime(request.GET.get('fecha', ''), '%Y-%m-%d').date()
+            except ValueError:
+                if por_defecto_hoy:
+                    fecha = timezone.localdate()
+            request._version_caja = (
+                (fecha, *CajaService.version_del_dia(fecha)) if fecha else None
+            )
+        return request._version_caja
+
+    def etag(request, *args, **kwargs):
+        datos = version(request)
+        if datos is None:
+            return None
+        fecha, numero, _ = datos
+        firma = hashlib.md5(
+            f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}".encode()
+        ).hexdigest()[:12]
+        return f'{fecha.isoformat()}-{numero}-{firma}'
+
+    def ultima_modificacion(request, *args, **kwargs):
+        datos = version(request)
+        return datos[2] if datos else None
+
+    def decorator(vista):
+        vista_condicional = condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+
+        @wraps(vista)
+        def inner(request, *args, **kwargs):
+            response = vista_condicional(request, *args, **kwargs)
+            if version(request) is not None:
+                # Obliga al navegador a revalidar en cada sondeo
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
 
 
 class TransaccionViewSet(viewsets.ModelViewSet):
     serializer_class = TransaccionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionTransacciones
     
     def get_queryset(self):
         queryset = Transaccion.objects.select_related('usuario').all()
@@ -29,7 +94,12 @@ class TransaccionViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-fecha', '-id')
 
+    @method_decorator(condicional_por_fecha())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
+    @method_decorator(condicional_por_fecha(por_defecto_hoy=True))
     def resumen_diario(self, request):
         fecha_param = request.query_params.get('fecha', None)
 
@@ -41,36 +111,83 @@ class TransaccionViewSet(viewsets.ModelViewSet):
         else:
             fecha_param = timezone.localdate()
 
-        transacciones = Transaccion.objects.filter(fecha=fecha_param)
-
-
         resumen = {
             'fecha': fecha_param,
-            'ventas_facturadas': transacciones.filter(
-                tipo=TipoTransaccion.VENTA_FACTURADA
-            ).aggregate(Sum('monto'))['monto__sum'] or 0,
-            'ventas_no_facturadas': transacciones.filter(
-                tipo=TipoTransaccion.VENTA_NO_FACTURADA
-            ).aggregate(Sum('monto'))['monto__sum'] or 0,
-            'otros_ingresos': transacciones.filter(
-                tipo=TipoTransaccion.INGRESO_OTRO
-            ).aggregate(Sum('monto'))['monto__sum'] or 0,
-            'total_transacciones': transacciones.count()
+            **CajaService.totales_del_dia(fecha_param)
         }
-        resumen['total'] = (
-            resumen['ventas_facturadas'] +
-            resumen['ventas_no_facturadas'] +
-            resumen['otros_ingresos']
-        )
         return Response(resumen)
 
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=[JSONParser, MultiPartParser])
+    def bulk(self, request):
+        """
+        Importa muchas transacciones en una sola petición: un arreglo JSON o
+        un archivo CSV en el campo 'archivo' con columnas
+        fecha, tipo, monto, descripcion, numero_factura.
+        """
+        archivo = request.FILES.get('archivo')
+
+        if archivo:
+            try:
+                lector = csv.DictReader(io.TextIOWrapper(archivo, encoding='utf-8-sig'))
+                filas = [
+                    {campo: valor for campo, valor in fila.items() if valor not in ('', None)}
+                    for fila in lector
+                ]
+            except (UnicodeDecodeError, csv.Error) as e:
+                return Response({
+                    'error': f'CSV inválido: {e}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            filas = request.data
+        else:
+            return Response({
+                'error': 'Debe enviar un arreglo JSON o un archivo CSV en el campo "archivo"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not filas:
+            return Response({
+                'error': 'No hay transacciones para importar'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(filas) > settings.CAJA_IMPORTACION_MAX_FILAS:
+            return Response({
+                'error': f'Máximo {settings.CAJA_IMPORTACION_MAX_FILAS} transacciones por importación'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        creadas, errores = CajaService.importar_transacciones(filas, request.user)
+
+        if errores:
+            return Response({
+                'error': 'Hay filas inválidas; no se importó ninguna transacción',
+                'total_filas': len(filas),
+                'filas_con_error': len(errores),
+                'errores': errores
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'creadas': len(creadas)}, status=status.HTTP_201_CREATED)
+
 
 class CierreCajaViewSet(viewsets.ModelViewSet):
     serializer_class = CierreCajaSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return CierreCaja.objects.all()
+        queryset = CierreCaja.objects.all()
+        fecha_str = self.request.query_params.get('fecha', None)
+
+        if fecha_str:
+            try:
+                fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+                queryset = queryset.filter(fecha=fecha_obj)
+            except ValueError:
+                pass
+
+        return queryset
+
+    @method_decorator(condicional_por_fecha())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     @action(detail=False, methods=['post'])
     def crear_cierre_hoy(self, request):
@@ -128,3 +245,128 @@ class CierreCajaViewSet(viewsets.ModelViewSet):
         cierre.calcular_totales()
         serializer = self.get_serializer(cierre)
         return Response(serializer.data)
+
+
+async def eventos_caja(request):
+    """
+    Canal Server-Sent Events del tablero de caja. Emite un evento 'caja'
+    cada vez que cambia la VersionCaja del día (escrituras de Transaccion o
+    CierreCaja) para que los clientes vuelvan a consultar solo entonces.
+    Requiere el servidor ASGI; bajo WSGI responde 204 y el cliente
+    vuelve al sondeo periódico.
+    """
+    autenticado = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not autenticado:
+        return HttpResponse(status=401)
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        _flujo_eventos_caja(request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class VigilanteVersionCaja:
+    """
+    Consulta la VersionCaja del día una vez por CAJA_EVENTOS_INTERVALO para
+    todo el proceso mientras haya flujos SSE abiertos, y despierta a todos
+    los flujos cuando cambia. La consulta corre en el hilo compartido de
+    sync_to_async (la tarea arranca con un contexto vacío), así que usa una
+    sola conexión por proceso sin importar cuántas pestañas estén abiertas.
+    """
+
+    _por_loop = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        self.estado = None  # (evento_id, fecha, version)
+        self.suscriptores = 0
+        self.tarea = None
+        self.cambio = asyncio.Event()
+
+    @classmethod
+    def del_proceso(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._por_loop:
+            cls._por_loop[loop] = cls()
+        return cls._por_loop[loop]
+
+    def suscribir(self):
+        self.suscriptores += 1
+        if self.tarea is None or self.tarea.done():
+            self.estado = None
+            self.tarea = contextvars.Context().run(asyncio.create_task, self._vigilar())
+
+    def retirar(self):
+        self.suscriptores -= 1
+
+    async def esperar(self, conocido, espera):
+        """
+        Devuelve el estado actual si su evento_id difiere de conocido; si no,
+        espera hasta el próximo cambio o hasta espera segundos (None).
+        """
+        if self.estado is not None and self.estado[0] != conocido:
+            return self.estado
+        try:
+            await asyncio.wait_for(self.cambio.wait(), espera)
+        except asyncio.TimeoutError:
+            return None
+        return self.estado
+
+    @staticmethod
+    def _consultar():
+        close_old_connections()
+        fecha = timezone.localdate()
+        version = VersionCaja.objects.filter(
+            fecha=fecha
+        ).values_list('version', flat=True).first() or 0
+        return f'{fecha.isoformat()}:{version}', fecha, version
+
+    async def _vigilar(self):
+        consultar = sync_to_async(self._consultar)
+        while self.suscriptores > 0:
+            try:
+                estado = await consultar()
+            except DatabaseError:
+                # Conexión caída: se reabre en la próxima consulta
+                await sync_to_async(connection.close)()
+                estado = self.estado
+            if estado != self.estado:
+                self.estado = estado
+                cambio, self.cambio = self.cambio, asyncio.Event()
+                cambio.set()
+            await asyncio.sleep(settings.CAJA_EVENTOS_INTERVALO)
+
+
+async def _flujo_eventos_caja(ultimo_id):
+    loop = asyncio.get_running_loop()
+    # La conexión se cierra periódicamente; EventSource reconecta enviando Last-Event-ID
+    fin = loop.time() + settings.CAJA_EVENTOS_DURACION
+    vigilante = VigilanteVersionCaja.del_proceso()
+
+    yield 'retry: 3000\n\n'
+
+    vigilante.suscribir()
+    try:
+        while (restante := fin - loop.time()) > 0:
+            estado = await vigilante.esperar(ultimo_id, min(15, restante))
+            if estado is None:
+                yield ': latido\n\n'
+                continue
+
+            evento_id, fecha, version = estado
+            if evento_id == ultimo_id:
+                continue
+            if ultimo_id is None:
+                # Primera conexión: solo registrar el id, el cliente ya cargó los datos
+                yield f'id: {evento_id}\n\n'
+            else:
+                datos = json.dumps({'fecha': fecha.isoformat(), 'version': version})
+                yield f'id: {evento_id}\nevent: caja\ndata: {datos}\n\n'
+            ultimo_id = evento_id
+    finally:
+        vigilante.retirar()
@@ -1,7 +1,9 @@
+from django import forms
 from django.contrib import admin
 
 # Register your models here.
-from .models import Cliente, Deuda, Abono
+from .models import Cliente, ClienteResumen, Deuda, Abono, SaldoDiarioCartera
+from .services import AbonoService
 
 # ADMIN CLIENTE
 
@@ -18,16 +20,101 @@ class DeudaAdmin(admin.ModelAdmin):
         'cliente',
         'descripcion',
         'monto',
+        'saldo',
         'pagada',
         'fecha',
         'fecha_vencimiento',
     )
     search_fields = ('cliente__nombre', 'descripcion')
     list_filter = ('pagada', 'fecha_vencimiento')
+    readonly_fields = ('total_abonado', 'saldo')
+
+    def delete_queryset(self, request, queryset):
+        # Borrar una a una para que Deuda.delete() actualice ClienteResumen
+        for deuda in queryset:
+            deuda.delete()
 
 # ADMIN ABONO
+class AbonoAdminForm(forms.ModelForm):
+    class Meta:
+        model = Abono
+        fields = '__all__'
+
+    def clean(self):
+        datos = super().clean()
+        deuda = datos.get('deuda')
+        monto = datos.get('monto')
+        # Aviso temprano en el formulario; la validación definitiva la hace
+        # AbonoService con la deuda bloqueada
+        if deuda and monto is not None:
+            disponible = deuda.saldo
+            # Al editar, el monto anterior ya está descontado del saldo de su deuda
+            if not self.instance._state.adding and self.instance.deuda_id == deuda.id:
+                disponible += Abono.objects.get(pk=self.instance.pk).monto
+            if monto > disponible:
+                raise forms.ValidationError(
+                    f'El abono no puede ser mayor al saldo restante (${disponible}).'
+                )
+        return datos
+
 @admin.register(Abono)
 class AbonoAdmin(admin.ModelAdmin):
+    form = AbonoAdminForm
     list_display = ('id', 'deuda', 'monto', 'fecha', 'descripcion')
     search_fields = ('deuda__cliente__nombre', 'descripcion')
     list_filter = ('fecha',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            AbonoService.actualizar_abono(obj)
+        else:
+            AbonoService.registrar_abono(obj)
+
+    def delete_queryset(self, request, queryset):
+        # Borrar uno a uno para que Abono.delete() actualice el saldo de la deuda
+        for abono in queryset:
+            abono.delete()
+
+# ADMIN RESUMEN DE CLIENTE (solo lectura: lo mantienen Deuda y Abono)
+@admin.register(ClienteResumen)
+class ClienteResumenAdmin(admin.ModelAdmin):
+    list_display = (
+        'cliente',
+        'total_deudas',
+        'deudas_activas',
+        'monto_total',
+        'monto_pagado',
+        'saldo_pendiente',
+        'vencimiento_mas_antiguo',
+        'actualizado',
+    )
+    search_fields = ('cliente__nombre',)
+    ordering = ('-saldo_pendiente',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# ADMIN SALDO DIARIO (solo lectura: lo escribe registrar_saldo_diario)
+@admin.register(SaldoDiarioCartera)
+class SaldoDiarioCarteraAdmin(admin.ModelAdmin):
+    list_display = (
+        'fecha',
+        'cliente',
+        'saldo_pendiente',
+        'saldo_vencido',
+        'total_cobrado',
+        'deudas_activas',
+        'deudas_vencidas',
+    )
+    list_filter = ('fecha',)
+    search_fields = ('cliente__nombre',)
+    ordering = ('-fecha',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cartera.models import Deuda
+
+class Command(BaseCommand):
+    help = 'Reconstruye total_abonado y saldo de todas las deudas a partir de sus abonos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cliente',
+            type=int,
+            help='Recalcular solo las deudas de este cliente (ID)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Recalculando saldos de deudas...'))
+
+        deudas = Deuda.objects.all()
+        if options['cliente']:
+            deudas = deudas.filter(cliente_id=options['cliente'])
+
+        with transaction.atomic():
+            actualizadas = deudas.recalcular_saldos()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Saldos recalculados: {actualizadas} deudas actualizadas'
+        ))
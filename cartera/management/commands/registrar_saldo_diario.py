@@ -0,0 +1,36 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cartera.services import SaldoDiarioService
+
+class Command(BaseCommand):
+    help = 'Guarda la foto diaria de la cartera (saldo pendiente, vencido y cobrado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--por-cliente',
+            action='store_true',
+            help='Guardar también una fila por cliente'
+        )
+        parser.add_argument(
+            '--ayer',
+            action='store_true',
+            help='Registrar la foto con la fecha de ayer (si corre pasada la medianoche)'
+        )
+
+    def handle(self, *args, **options):
+        fecha = timezone.localdate()
+        if options['ayer']:
+            fecha -= timedelta(days=1)
+
+        self.stdout.write(self.style.WARNING(f'Registrando saldo de cartera del {fecha}...'))
+
+        total = SaldoDiarioService.registrar(fecha, por_cliente=options['por_cliente'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Foto registrada:\n'
+            f'  - Saldo pendiente: ${total.saldo_pendiente}\n'
+            f'  - Saldo vencido: ${total.saldo_vencido}\n'
+            f'  - Cobrado en el día: ${total.total_cobrado}\n'
+            f'  - Deudas activas: {total.deudas_activas} ({total.deudas_vencidas} vencidas)\n'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cartera.models import ClienteResumen
+
+class Command(BaseCommand):
+    help = 'Compara el resumen de cada cliente con sus deudas y reconstruye los que no coinciden'
+
+    TAMANO_LOTE = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar',
+            action='store_true',
+            help='Solo informar las diferencias, sin corregirlas'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Verificando resumen de clientes...'))
+
+        diferentes = ClienteResumen.diferencias()
+
+        if not diferentes:
+            self.stdout.write(self.style.SUCCESS('✅ Todos los resúmenes coinciden con las deudas'))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(diferentes)} clientes con resumen desactualizado: '
+            f'{", ".join(str(cliente_id) for cliente_id in diferentes[:20])}'
+            f'{"..." if len(diferentes) > 20 else ""}'
+        ))
+
+        if options['solo_verificar']:
+            return
+
+        for inicio in range(0, len(diferentes), self.TAMANO_LOTE):
+            with transaction.atomic():
+                ClienteResumen.actualizar(diferentes[inicio:inicio + self.TAMANO_LOTE])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Resúmenes reconstruidos: {len(diferentes)} clientes'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:11
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_saldos(apps, schema_editor):
+    Deuda = apps.get_model('cartera', 'Deuda')
+    Abono = apps.get_model('cartera', 'Abono')
+
+    total_abonos = Abono.objects.filter(
+        deuda=OuterRef('pk')
+    ).order_by().values('deuda').annotate(total=Sum('monto')).values('total')
+
+    Deuda.objects.update(
+        total_abonado=Coalesce(
+            Subquery(total_abonos), Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+    Deuda.objects.update(saldo=F('monto') - F('total_abonado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0003_cliente_direccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deuda',
+            name='saldo',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='deuda',
+            name='total_abonado',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0004_deuda_saldos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='abono',
+            index=models.Index(fields=['deuda', 'fecha'], name='abono_deuda_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deuda',
+            index=models.Index(condition=models.Q(('pagada', False)), fields=['fecha_vencimiento'], name='deuda_activa_venc_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0005_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCartera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Versión de Cartera',
+                'verbose_name_plural': 'Versiones de Cartera',
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+import unicodedata
+
+
+# Copia de cartera.models.palabras_busqueda/terminos_busqueda al crear la
+# migración: la migración no debe cambiar si cambian las del modelo
+
+def palabras_busqueda(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', texto)
+
+
+def terminos_busqueda(nombre, correo, telefono):
+    terminos = set(palabras_busqueda(nombre)) | set(palabras_busqueda(correo))
+    grupos = palabras_busqueda(telefono)
+    if grupos:
+        terminos |= {''.join(grupos), *grupos}
+    return sorted(terminos)
+
+
+def indexar_clientes(apps, schema_editor):
+    Cliente = apps.get_model('cartera', 'Cliente')
+    TerminoBusquedaCliente = apps.get_model('cartera', 'TerminoBusquedaCliente')
+
+    TerminoBusquedaCliente.objects.bulk_create(
+        (
+            TerminoBusquedaCliente(cliente_id=cliente['id'], termino=termino[:100])
+            for cliente in Cliente.objects.values('id', 'nombre', 'correo', 'telefono').iterator()
+            for termino in terminos_busqueda(cliente['nombre'], cliente['correo'], cliente['telefono'])
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0006_versioncartera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusquedaCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=100)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to='cartera.cliente')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['termino', 'cliente'], name='termino_cliente_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_clientes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:49
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def poblar_resumenes(apps, schema_editor):
+    Cliente = apps.get_model('cartera', 'Cliente')
+    ClienteResumen = apps.get_model('cartera', 'ClienteResumen')
+
+    activas = Q(deuda__pagada=False)
+    cero = Value(Decimal('0.00'))
+    campo = DecimalField(max_digits=12, decimal_places=2)
+    clientes = Cliente.objects.order_by().values('id').annotate(
+        total_deudas=Count('deuda'),
+        deudas_activas=Count('deuda', filter=activas),
+        monto_total=Coalesce(Sum('deuda__monto'), cero, output_field=campo),
+        saldo_pendiente=Coalesce(Sum('deuda__saldo', filter=activas), cero, output_field=campo),
+        vencimiento_mas_antiguo=Min('deuda__fecha_vencimiento', filter=activas & Q(deuda__saldo__gt=0)),
+    ).annotate(
+        monto_pagado=F('monto_total') - F('saldo_pendiente')
+    )
+
+    ClienteResumen.objects.bulk_create(
+        (
+            ClienteResumen(cliente_id=valores.pop('id'), **valores)
+            for valores in clientes.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0007_terminobusquedacliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteResumen',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='cartera.cliente')),
+                ('total_deudas', models.PositiveIntegerField(default=0)),
+                ('deudas_activas', models.PositiveIntegerField(default=0)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('monto_pagado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('vencimiento_mas_antiguo', models.DateField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Cliente',
+                'verbose_name_plural': 'Resúmenes de Clientes',
+                'indexes': [models.Index(fields=['-saldo_pendiente', 'cliente'], name='resumen_saldo_idx'), models.Index(fields=['vencimiento_mas_antiguo'], name='resumen_venc_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:52
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0008_clienteresumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiarioCartera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('saldo_vencido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_cobrado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('deudas_activas', models.PositiveIntegerField(default=0)),
+                ('deudas_vencidas', models.PositiveIntegerField(default=0)),
+                ('registrado', models.DateTimeField(auto_now=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='cartera.cliente')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario de Cartera',
+                'verbose_name_plural': 'Saldos Diarios de Cartera',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='saldodiariocartera',
+            constraint=models.UniqueConstraint(condition=models.Q(('cliente__isnull', True)), fields=('fecha',), name='saldo_diario_total_fecha'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldodiariocartera',
+            constraint=models.UniqueConstraint(fields=('cliente', 'fecha'), name='saldo_diario_cliente_fecha'),
+        ),
+    ]
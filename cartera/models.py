@@ -1,7 +1,65 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import connection, models, transaction
+from django.db.models import (
+    BooleanField, Case, Count, DecimalField, F, Func, IntegerField, Min,
+    OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
+import re
+import unicodedata
+
+# Alfabeto de los términos de búsqueda, en orden de comparación
+ALFABETO_BUSQUEDA = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+def palabras_busqueda(texto):
+    """Minúsculas sin tildes ni signos: 'Peña-López' -> ['pena', 'lopez']"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', texto)
+
+def terminos_busqueda(nombre, correo, telefono):
+    """Términos indexados de un cliente: palabras de nombre y correo, y el teléfono"""
+    terminos = set(palabras_busqueda(nombre)) | set(palabras_busqueda(correo))
+    grupos = palabras_busqueda(telefono)
+    if grupos:
+        # Teléfono completo sin separadores, además de cada grupo de dígitos
+        terminos |= {''.join(grupos), *grupos}
+    return sorted(terminos)
+
+def limite_prefijo(prefijo):
+    """Menor término mayor que todos los que empiezan por prefijo (None si no hay)"""
+    base = prefijo.rstrip(ALFABETO_BUSQUEDA[-1])
+    if not base:
+        return None
+    return base[:-1] + ALFABETO_BUSQUEDA[ALFABETO_BUSQUEDA.index(base[-1]) + 1]
+
+
+class ClienteQuerySet(models.QuerySet):
+
+    MAX_PALABRAS_BUSQUEDA = 5
+
+    def buscar(self, consulta):
+        """
+        Clientes con alguna palabra de nombre, correo o teléfono que empiece
+        por cada palabra de la consulta, sin distinguir tildes ni mayúsculas.
+        Cada palabra es un rango [prefijo, limite) sobre el índice de
+        TerminoBusquedaCliente, así que no recorre la tabla de clientes.
+        """
+        palabras = palabras_busqueda(consulta)
+        if not palabras:
+            return self.none()
+
+        clientes = self
+        for palabra in palabras[:self.MAX_PALABRAS_BUSQUEDA]:
+            terminos = TerminoBusquedaCliente.objects.filter(termino__gte=palabra)
+            limite = limite_prefijo(palabra)
+            if limite:
+                terminos = terminos.filter(termino__lt=limite)
+            clientes = clientes.filter(id__in=terminos.values('cliente_id'))
+        return clientes
+
 
 class Cliente(models.Model):
     nombre = models.CharField(max_length=100)
@@ -9,9 +67,209 @@ class Cliente(models.Model):
     telefono = models.CharField(max_length=15, blank=True)
     direccion = models.CharField(max_length=200, blank=True, default='')
 
+    objects = ClienteQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            self.indexar_busqueda()
+            if adding:
+                ClienteResumen.objects.create(cliente=self)
+
+    def indexar_busqueda(self):
+        """
+        Regenera los términos de búsqueda del cliente. save() lo hace solo;
+        las operaciones masivas (bulk_create, update) deben llamarlo.
+        """
+        TerminoBusquedaCliente.objects.filter(cliente=self).delete()
+        TerminoBusquedaCliente.objects.bulk_create([
+            TerminoBusquedaCliente(cliente=self, termino=termino[:100])
+            for termino in terminos_busqueda(self.nombre, self.correo, self.telefono)
+        ])
+
+
+class TerminoBusquedaCliente(models.Model):
+    """Palabra normalizada de nombre, correo o teléfono de un cliente"""
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='terminos_busqueda')
+    termino = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            # Cubre la búsqueda por rango de prefijo y devuelve el cliente sin ir a la tabla
+            models.Index(fields=['termino', 'cliente'], name='termino_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return self.termino
+
+
+class VersionCartera(models.Model):
+    """
+    Contador global de cambios en Cliente, Deuda y Abono (una sola fila).
+    Lo incrementan, al confirmar cada transacción, las señales de
+    cartera/signals.py y las operaciones masivas. Forma parte de las claves de caché de estadísticas y reportes:
+    si la cartera cambia, la clave cambia y el dato se vuelve a calcular.
+    """
+    version = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Versión de Cartera'
+        verbose_name_plural = 'Versiones de Cartera'
+
+    def __str__(self):
+        return f"v{self.version}"
+
+    @staticmethod
+    def incrementar():
+        """
+        Incrementa la versión al confirmarse la transacción en curso (en modo
+        autocommit, enseguida). Así el UPDATE de la única fila no queda
+        bloqueado hasta el commit de cada escritura, lo que serializaría
+        todas las escrituras de cartera del sistema.
+        """
+        transaction.on_commit(VersionCartera._incrementar)
+
+    @staticmethod
+    def _incrementar():
+        actualizadas = VersionCartera.objects.filter(pk=1).update(
+            version=F('version') + 1,
+            actualizado=timezone.now()
+        )
+        if not actualizadas:
+            VersionCartera.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    @staticmethod
+    def actual():
+        return VersionCartera.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+class DiasEntre(Func):
+    """Días transcurridos entre dos fechas, calculados en la base de datos."""
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='DATEDIFF(%(expressions)s)',
+            arg_joiner=', ',
+            **extra_context
+        )
+
+
+class DeudaQuerySet(models.QuerySet):
+
+    @staticmethod
+    def filtro_vencidas(hoy=None):
+        """Condición de deuda vencida: fecha pasada, sin pagar y con saldo."""
+        return Q(
+            fecha_vencimiento__lt=hoy or timezone.now().date(),
+            pagada=False,
+            saldo__gt=0
+        )
+
+    def vencidas(self):
+        return self.filter(self.filtro_vencidas())
+
+    def con_saldo(self):
+        """
+        Anota cada deuda con saldo_restante, esta_vencida y dias_vencidos
+        leyendo las columnas de saldo, sin agregados por fila.
+        Los valores anotados reemplazan a calcular_saldo_restante() y
+        esta_vencida() en las instancias devueltas.
+        """
+        hoy = timezone.now().date()
+        vencida = self.filtro_vencidas(hoy)
+
+        return self.annotate(
+            saldo_restante=F('saldo'),
+            esta_vencida=Case(
+                When(vencida, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+            dias_vencidos=Case(
+                When(vencida, then=DiasEntre(Value(hoy), F('fecha_vencimiento'))),
+                default=None,
+                output_field=IntegerField()
+            ),
+        )
+
+    # Tramos de antigüedad: (nombre, días vencidos desde, hasta; None = sin límite)
+    TRAMOS_ANTIGUEDAD = (
+        ('de_1_a_30', 1, 30),
+        ('de_31_a_60', 31, 60),
+        ('de_61_a_90', 61, 90),
+        ('mas_de_90', 91, None),
+    )
+    # Columnas de antiguedad_por_cliente() además del cliente
+    CAMPOS_ANTIGUEDAD = ('por_vencer',) + tuple(nombre for nombre, _, _ in TRAMOS_ANTIGUEDAD) + ('saldo_total',)
+
+    def antiguedad_por_cliente(self, fecha_corte=None):
+        """
+        Saldo pendiente de cada cliente repartido por tramos de antigüedad
+        (por_vencer, de_1_a_30, ..., mas_de_90) y saldo_total, en una sola
+        consulta agrupada con Sum(Case/When). Los tramos comparan
+        fecha_vencimiento con fechas límite, sin calcular días por fila.
+        """
+        hoy = fecha_corte or timezone.now().date()
+        cero = Value(Decimal('0.00'))
+        campo = DecimalField(max_digits=12, decimal_places=2)
+
+        def suma_si(condicion):
+            return Sum(Case(When(condicion, then=F('saldo')), default=cero, output_field=campo))
+
+        tramos = {
+            'por_vencer': suma_si(Q(fecha_vencimiento__isnull=True) | Q(fecha_vencimiento__gte=hoy)),
+        }
+        for nombre, desde, hasta in self.TRAMOS_ANTIGUEDAD:
+            condicion = Q(fecha_vencimiento__lte=hoy - timedelta(days=desde))
+            if hasta is not None:
+                condicion &= Q(fecha_vencimiento__gte=hoy - timedelta(days=hasta))
+            tramos[nombre] = suma_si(condicion)
+
+        return self.filter(pagada=False, saldo__gt=0).order_by().values(
+            'cliente_id', 'cliente__nombre'
+        ).annotate(
+            saldo_total=Sum('saldo', output_field=campo), **tramos
+        ).order_by('cliente__nombre', 'cliente_id')
+
+    def recalcular_saldos(self):
+        """
+        Reconstruye total_abonado y saldo a partir de los abonos con dos
+        UPDATE masivos. Devuelve el número de deudas actualizadas.
+        """
+        total_abonos = Abono.objects.filter(
+            deuda=OuterRef('pk')
+        ).order_by().values('deuda').annotate(
+            total=Sum('monto')
+        ).values('total')
+
+        actualizadas = self.update(
+            total_abonado=Coalesce(
+                Subquery(total_abonos), Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+        self.update(saldo=F('monto') - F('total_abonado'))
+        ClienteResumen.actualizar(self.values('cliente_id'))
+        VersionCartera.incrementar()
+        return actualizadas
+
+
 class Deuda(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
     monto = models.DecimalField(max_digits=10, decimal_places=2)
@@ -19,22 +277,115 @@ class Deuda(models.Model):
     pagada = models.BooleanField(default=False)
     descripcion = models.CharField(max_length=200, blank=True, default='Deuda pendiente')
     fecha_vencimiento = models.DateField(null=True, blank=True)
+    # Saldos desnormalizados: solo se escriben con incrementos F() desde Abono
+    # o con las filas bloqueadas (AbonoService.aplicar_pago)
+    total_abonado = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+    saldo = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+
+    objects = DeudaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Solo deudas activas: las consultas de vencidas filtran pagada=False
+            models.Index(
+                fields=['fecha_vencimiento'],
+                name='deuda_activa_venc_idx',
+                condition=Q(pagada=False)
+            ),
+        ]
+
+    CAMPOS_SALDO = ('total_abonado', 'saldo')
 
     def __str__(self):
         return f"{self.cliente} - ${self.monto}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            monto = self._meta.get_field('monto').to_python(self.monto)
+            self.saldo = monto - self.total_abonado
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                ClienteResumen.actualizar([self.cliente_id])
+            return
+
+        # Nunca sobrescribir los saldos con valores posiblemente desactualizados
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CAMPOS_SALDO
+            ]
+
+        with transaction.atomic():
+            anterior = Deuda.objects.filter(pk=self.pk).values('cliente_id', 'monto').first() or {}
+            # Si la deuda cambia de cliente, el resumen del anterior también cambia
+            clientes_ids = {self.cliente_id}
+            if 'cliente' in kwargs['update_fields'] and anterior:
+                clientes_ids.add(anterior['cliente_id'])
+            super().save(*args, **kwargs)
+
+            # Igual que en aplicar_abono: saldada si el saldo llega a cero; si
+            # el monto sube deja de estarlo, si no conserva la marca manual
+            sube = 'monto' in kwargs['update_fields'] and anterior and (
+                self._meta.get_field('monto').to_python(self.monto) > anterior['monto']
+            )
+            Deuda.objects.filter(pk=self.pk).update(
+                saldo=F('monto') - F('total_abonado'),
+                pagada=Case(
+                    When(monto__lte=F('total_abonado'), then=Value(True)),
+                    default=Value(False) if sube else F('pagada'),
+                    output_field=BooleanField()
+                )
+            )
+            ClienteResumen.actualizar(clientes_ids)
+        self.refresh_from_db(fields=self.CAMPOS_SALDO + ('pagada',))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            ClienteResumen.actualizar([self.cliente_id])
+        return resultado
+
+    @staticmethod
+    def bloquear(deudas_ids):
+        """
+        Bloquea las filas de las deudas hasta el final de la transacción, en
+        orden de pk para evitar interbloqueos. SQLite ignora FOR UPDATE: ahí
+        un UPDATE sin cambios toma el bloqueo de escritura desde el inicio y
+        evita que dos transacciones lectoras choquen al pasar a escribir.
+        deudas_ids puede ser una lista o un queryset de values('pk').
+        """
+        deudas = Deuda.objects.filter(pk__in=deudas_ids)
+        if connection.features.has_select_for_update:
+            list(deudas.select_for_update().order_by('pk').values_list('pk'))
+        else:
+            deudas.update(saldo=F('saldo'))
+
+    @staticmethod
+    def aplicar_abono(deuda_id, delta):
+        """
+        Suma delta al total abonado de la deuda y ajusta saldo y pagada en un
+        único UPDATE. Debe llamarse con la fila bloqueada (Deuda.bloquear).
+        """
+        # En el SET, F('saldo') es el valor anterior a la actualización
+        pagada = Case(
+            When(saldo__lte=delta, then=Value(True)),
+            default=F('pagada') if delta >= 0 else Value(False),
+            output_field=BooleanField()
+        )
+        Deuda.objects.filter(pk=deuda_id).update(
+            total_abonado=F('total_abonado') + delta,
+            saldo=F('saldo') - delta,
+            pagada=pagada
+        )
+
     def calcular_saldo_restante(self):
-        total_abonado = self.abono_set.aggregate(
-            total=Sum('monto')
-        )['total'] or Decimal('0.00')
-        return self.monto - total_abonado
+        return self.saldo
 
     def esta_vencida(self):
         if not self.fecha_vencimiento:
             return False
         hoy = timezone.now().date()
-        saldo_restante = self.calcular_saldo_restante()
-        return self.fecha_vencimiento < hoy and saldo_restante > 0 and not self.pagada
+        return self.fecha_vencimiento < hoy and self.saldo > 0 and not self.pagada
 
 class Abono(models.Model):
     deuda = models.ForeignKey(Deuda, on_delete=models.CASCADE)
@@ -42,14 +393,205 @@ class Abono(models.Model):
     fecha = models.DateField(auto_now_add=True)
     descripcion = models.CharField(max_length=200, blank=True, default='Abono a deuda')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deuda', 'fecha'], name='abono_deuda_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"Abono ${self.monto} - {self.deuda.cliente}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        saldo_restante = self.deuda.calcular_saldo_restante()
-        
-        if saldo_restante <= 0:
-            self.deuda.pagada = True
-            self.deuda.save()
\ No newline at end of file
+        # El monto se usa en los incrementos F() antes de que save() lo convierta
+        self.monto = self._meta.get_field('monto').to_python(self.monto)
+        with transaction.atomic():
+            anterior = None
+            if not self._state.adding:
+                anterior = Abono.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('deuda_id', 'monto').first()
+
+            deudas_ids = {self.deuda_id}
+            if anterior:
+                deudas_ids.add(anterior['deuda_id'])
+            Deuda.bloquear(deudas_ids)
+
+            super().save(*args, **kwargs)
+
+            if anterior is None:
+                Deuda.aplicar_abono(self.deuda_id, self.monto)
+            elif anterior['deuda_id'] == self.deuda_id:
+                Deuda.aplicar_abono(self.deuda_id, self.monto - anterior['monto'])
+            else:
+                Deuda.aplicar_abono(anterior['deuda_id'], -anterior['monto'])
+                Deuda.aplicar_abono(self.deuda_id, self.monto)
+
+            ClienteResumen.actualizar(
+                Deuda.objects.filter(pk__in=deudas_ids).values('cliente_id')
+            )
+
+        self._refrescar_deuda()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Deuda.bloquear([self.deuda_id])
+            monto = Abono.objects.filter(pk=self.pk).values_list('monto', flat=True).first()
+            resultado = super().delete(*args, **kwargs)
+            if monto is not None:
+                Deuda.aplicar_abono(self.deuda_id, -monto)
+                ClienteResumen.actualizar(
+                    Deuda.objects.filter(pk=self.deuda_id).values('cliente_id')
+                )
+
+        self._refrescar_deuda()
+        return resultado
+
+    def _refrescar_deuda(self):
+        if Abono.deuda.is_cached(self):
+            self.deuda.refresh_from_db(fields=['total_abonado', 'saldo', 'pagada'])
+
+
+class ClienteResumen(models.Model):
+    """
+    Totales de cartera de cada cliente (una fila por cliente). Los mantienen
+    al día Deuda.save/delete, Abono.save/delete y las operaciones masivas de
+    cartera, recalculando solo los clientes afectados dentro de la misma
+    transacción. El comando verificar_resumen_clientes los compara con las
+    deudas y corrige las diferencias.
+    """
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+    total_deudas = models.PositiveIntegerField(default=0)
+    deudas_activas = models.PositiveIntegerField(default=0)
+    monto_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # Vencimiento más antiguo entre las deudas activas con saldo
+    vencimiento_mas_antiguo = models.DateField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    CAMPOS = (
+        'total_deudas', 'deudas_activas', 'monto_total', 'monto_pagado',
+        'saldo_pendiente', 'vencimiento_mas_antiguo',
+    )
+
+    class Meta:
+        verbose_name = 'Resumen de Cliente'
+        verbose_name_plural = 'Resúmenes de Clientes'
+        indexes = [
+            # Mayores deudores: ORDER BY saldo_pendiente DESC, cliente_id
+            models.Index(fields=['-saldo_pendiente', 'cliente'], name='resumen_saldo_idx'),
+            models.Index(fields=['vencimiento_mas_antiguo'], name='resumen_venc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente_id} - ${self.saldo_pendiente}"
+
+    @staticmethod
+    def calcular(clientes=None):
+        """
+        Totales calculados desde las deudas, en una consulta agrupada por
+        cliente. clientes puede ser una lista de ids o un queryset de
+        values('cliente_id'); None calcula todos.
+        """
+        activas = Q(deuda__pagada=False)
+        cero = Value(Decimal('0.00'))
+        campo = DecimalField(max_digits=12, decimal_places=2)
+
+        consulta = Cliente.objects.all()
+        if clientes is not None:
+            consulta = consulta.filter(pk__in=clientes)
+
+        return consulta.order_by().values('id').annotate(
+            total_deudas=Count('deuda'),
+            deudas_activas=Count('deuda', filter=activas),
+            monto_total=Coalesce(Sum('deuda__monto'), cero, output_field=campo),
+            saldo_pendiente=Coalesce(Sum('deuda__saldo', filter=activas), cero, output_field=campo),
+            vencimiento_mas_antiguo=Min('deuda__fecha_vencimiento', filter=activas & Q(deuda__saldo__gt=0)),
+        ).annotate(
+            monto_pagado=F('monto_total') - F('saldo_pendiente')
+        ).order_by('id')
+
+    @staticmethod
+    def bloquear(clientes):
+        """
+        Bloquea los resúmenes de los clientes hasta el final de la transacción,
+        en orden de pk, igual que Deuda.bloquear (en SQLite, con un UPDATE sin
+        cambios que toma el bloqueo de escritura).
+        """
+        resumenes = ClienteResumen.objects.filter(cliente_id__in=clientes)
+        if connection.features.has_select_for_update:
+            list(resumenes.select_for_update().order_by('pk').values_list('pk'))
+        else:
+            resumenes.update(saldo_pendiente=F('saldo_pendiente'))
+
+    @staticmethod
+    def actualizar(clientes):
+        """
+        Recalcula el resumen de los clientes indicados (ver calcular()) y lo
+        guarda. Debe llamarse dentro de la transacción que cambia sus deudas
+        o abonos; las operaciones masivas (update, bulk_create) deben llamarlo.
+        Las filas se bloquean antes de calcular: dos escrituras simultáneas
+        sobre deudas del mismo cliente se turnan, y la segunda agrega ya con
+        los cambios confirmados de la primera en lugar de pisarlos.
+        """
+        with transaction.atomic(savepoint=False):
+            ClienteResumen.bloquear(clientes)
+            for valores in ClienteResumen.calcular(clientes):
+                cliente_id = valores.pop('id')
+                actualizadas = ClienteResumen.objects.filter(cliente_id=cliente_id).update(
+                    actualizado=timezone.now(), **valores
+                )
+                if not actualizadas:
+                    ClienteResumen.objects.create(cliente_id=cliente_id, **valores)
+
+    @staticmethod
+    def diferencias():
+        """
+        Ids de los clientes cuyo resumen guardado no coincide con el calculado
+        desde las deudas (o no existe).
+        """
+        guardados = {
+            fila['cliente_id']: fila
+            for fila in ClienteResumen.objects.values('cliente_id', *ClienteResumen.CAMPOS)
+        }
+        diferentes = []
+        for valores in ClienteResumen.calcular().iterator(chunk_size=2000):
+            guardado = guardados.get(valores['id'])
+            if guardado is None or any(guardado[campo] != valores[campo] for campo in ClienteResumen.CAMPOS):
+                diferentes.append(valores['id'])
+        return diferentes
+
+
+class SaldoDiarioCartera(models.Model):
+    """
+    Foto diaria de la cartera que escribe el comando registrar_saldo_diario:
+    una fila por día con los totales (cliente vacío) y, opcionalmente, una
+    por cliente. Las tendencias y cierres de mes leen estas filas en lugar
+    de reconstruir los saldos desde todos los abonos.
+    """
+    fecha = models.DateField()
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, null=True, blank=True, related_name='saldos_diarios')
+    saldo_pendiente = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    saldo_vencido = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    # Abonos registrados ese día
+    total_cobrado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    deudas_activas = models.PositiveIntegerField(default=0)
+    deudas_vencidas = models.PositiveIntegerField(default=0)
+    registrado = models.DateTimeField(auto_now=True)
+
+    CAMPOS = ('saldo_pendiente', 'saldo_vencido', 'total_cobrado', 'deudas_activas', 'deudas_vencidas')
+
+    class Meta:
+        ordering = ['fecha']
+        verbose_name = 'Saldo Diario de Cartera'
+        verbose_name_plural = 'Saldos Diarios de Cartera'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha'], condition=Q(cliente__isnull=True), name='saldo_diario_total_fecha'
+            ),
+            # Su índice también sirve a la tendencia de un cliente por rango de fechas
+            models.UniqueConstraint(fields=['cliente', 'fecha'], name='saldo_diario_cliente_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.cliente_id or 'Total'} - ${self.saldo_pendiente}"
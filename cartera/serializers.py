@@ -1,11 +1,23 @@
 from rest_framework import serializers
-from .models import Cliente, Deuda, Abono
+from .models import Cliente, ClienteResumen, Deuda, Abono
+
+class ClienteResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClienteResumen
+        fields = list(ClienteResumen.CAMPOS)
 
 class ClienteSerializer(serializers.ModelSerializer):
+    resumen = ClienteResumenSerializer(read_only=True)
+    
     class Meta:
         model = Cliente
         fields = '__all__'
 
+class ClienteBusquedaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cliente
+        fields = ['id', 'nombre', 'correo', 'telefono', 'direccion']
+
 class DeudaSerializer(serializers.ModelSerializer):
     saldo_restante = serializers.SerializerMethodField()
     esta_vencida = serializers.SerializerMethodField()
@@ -15,19 +27,25 @@ class DeudaSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_saldo_restante(self, obj):
-        # Calcula la suma de todos los abonos
-        total_abonado = sum(abono.monto for abono in obj.abono_set.all())
-        return obj.monto - total_abonado
+        return obj.saldo
     
     def get_esta_vencida(self, obj):
-        from django.utils import timezone
-        if hasattr(obj, 'fecha_vencimiento') and obj.fecha_vencimiento:
-            hoy = timezone.now().date()
-            saldo = self.get_saldo_restante(obj)
-            return obj.fecha_vencimiento < hoy and saldo > 0 and not obj.pagada
-        return False
+        # Usa el valor anotado por Deuda.objects.con_saldo() si está disponible
+        if 'esta_vencida' in obj.__dict__:
+            return obj.esta_vencida
+        return obj.esta_vencida()
 
 class AbonoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Abono
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class MovimientoEstadoCuentaSerializer(serializers.Serializer):
+    tipo = serializers.CharField()
+    id = serializers.IntegerField()
+    deuda = serializers.IntegerField()
+    fecha = serializers.DateField()
+    descripcion = serializers.CharField()
+    cargo = serializers.DecimalField(max_digits=12, decimal_places=2)
+    abono = serializers.DecimalField(max_digits=12, decimal_places=2)
+    saldo = serializers.DecimalField(max_digits=12, decimal_places=2)
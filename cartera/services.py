@@ -0,0 +1,287 @@
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from decimal import Decimal, InvalidOperation
+from .models import ClienteResumen, Deuda, DeudaQuerySet, Abono, SaldoDiarioCartera, VersionCartera
+
+
+class AbonoInvalido(ValueError):
+    """El abono no se puede registrar; el mensaje se muestra al usuario."""
+
+
+class AbonoService:
+
+    @staticmethod
+    def leer_monto(valor):
+        """Convierte el monto recibido a Decimal positivo con hasta dos decimales"""
+        try:
+            monto = Decimal(str(valor))
+        except (InvalidOperation, ValueError, TypeError):
+            raise AbonoInvalido('Monto inválido. Ingrese un número válido.')
+
+        if not monto.is_finite() or monto <= 0:
+            raise AbonoInvalido('El monto del abono debe ser mayor a cero.')
+        if monto.as_tuple().exponent < -2:
+            raise AbonoInvalido('El monto admite como máximo dos decimales.')
+        return monto
+
+    @staticmethod
+    def registrar_abono(abono):
+        """
+        Guarda un Abono nuevo validando su monto contra el saldo con la fila
+        de la deuda bloqueada, de modo que dos pagos simultáneos no puedan
+        pasar la validación a la vez y sobrepagar la deuda. Es el único
+        camino de alta de abonos (vista del listado, API y admin).
+        Devuelve el abono guardado o lanza AbonoInvalido / Deuda.DoesNotExist.
+        """
+        monto = abono.monto = AbonoService.leer_monto(abono.monto)
+
+        with transaction.atomic():
+            Deuda.bloquear([abono.deuda_id])
+            # Leído con la fila bloqueada: ningún otro abono puede cambiarlo
+            saldo = Deuda.objects.filter(pk=abono.deuda_id).values_list('saldo', flat=True).first()
+            if saldo is None:
+                raise Deuda.DoesNotExist(f'No existe la deuda {abono.deuda_id}')
+            if monto > saldo:
+                raise AbonoInvalido(f'El abono no puede ser mayor al saldo restante (${saldo}).')
+
+            abono.save()
+
+        return abono
+
+    @staticmethod
+    def actualizar_abono(abono):
+        """
+        Guarda los cambios de un Abono existente (monto o deuda) con la misma
+        validación que registrar_abono: con el abono y las deudas bloqueados,
+        la diferencia contra el monto anterior no puede superar el saldo
+        actual (el monto completo, si el abono pasa a otra deuda).
+        Devuelve el abono guardado o lanza AbonoInvalido / Abono.DoesNotExist.
+        """
+        monto = abono.monto = AbonoService.leer_monto(abono.monto)
+
+        with transaction.atomic():
+            anterior = Abono.objects.select_for_update().filter(
+                pk=abono.pk
+            ).values('deuda_id', 'monto').first()
+            if anterior is None:
+                raise Abono.DoesNotExist(f'No existe el abono {abono.pk}')
+
+            Deuda.bloquear({abono.deuda_id, anterior['deuda_id']})
+            saldo = Deuda.objects.filter(pk=abono.deuda_id).values_list('saldo', flat=True).first()
+            if saldo is None:
+                raise Deuda.DoesNotExist(f'No existe la deuda {abono.deuda_id}')
+
+            # En la misma deuda, el monto anterior ya está descontado del saldo
+            disponible = saldo + anterior['monto'] if anterior['deuda_id'] == abono.deuda_id else saldo
+            if monto > disponible:
+                raise AbonoInvalido(f'El abono no puede ser mayor al saldo restante (${disponible}).')
+
+            abono.save()
+
+        return abono
+
+    @staticmethod
+    def aplicar_pago(cliente_id, monto, descripcion=None):
+        """
+        Reparte un pago entre las deudas abiertas del cliente, primero las de
+        vencimiento más antiguo (las que no tienen vencimiento, al final).
+        Con las deudas bloqueadas lee todos los saldos en una consulta, crea
+        los abonos con un bulk_create y actualiza saldos y pagada con un
+        bulk_update, todo en una transacción. Devuelve la lista de
+        (deuda, abono) o lanza AbonoInvalido si el pago supera la deuda total.
+        """
+        monto = AbonoService.leer_monto(monto)
+
+        with transaction.atomic():
+            abiertas = Deuda.objects.filter(cliente_id=cliente_id, pagada=False, saldo__gt=0)
+            Deuda.bloquear(abiertas.values('pk'))
+
+            deudas = list(abiertas.order_by(
+                F('fecha_vencimiento').asc(nulls_last=True), 'fecha', 'id'
+            ).only('id', 'descripcion', 'total_abonado', 'saldo', 'pagada'))
+
+            saldo_total = sum((deuda.saldo for deuda in deudas), Decimal('0.00'))
+            if monto > saldo_total:
+                raise AbonoInvalido(f'El pago no puede ser mayor al saldo pendiente del cliente (${saldo_total}).')
+
+            aplicados = []
+            restante = monto
+            for deuda in deudas:
+                if restante <= 0:
+                    break
+                parte = min(restante, deuda.saldo)
+                restante -= parte
+
+                # Valores absolutos: las filas siguen bloqueadas hasta el commit
+                deuda.total_abonado += parte
+                deuda.saldo -= parte
+                deuda.pagada = deuda.saldo <= 0
+                aplicados.append((deuda, Abono(
+                    deuda=deuda,
+                    monto=parte,
+                    descripcion=descripcion or f'Pago aplicado a {deuda.descripcion}'[:200]
+                )))
+
+            Abono.objects.bulk_create([abono for _, abono in aplicados])
+            Deuda.objects.bulk_update([deuda for deuda, _ in aplicados], ['total_abonado', 'saldo', 'pagada'])
+            # bulk_create y bulk_update no pasan por save() ni emiten señales
+            ClienteResumen.actualizar([cliente_id])
+            VersionCartera.incrementar()
+
+        return aplicados
+
+
+class EstadoCuentaService:
+
+    # Dentro de un mismo día los cargos van antes que los abonos
+    ORDEN_DEUDA = 0
+    ORDEN_ABONO = 1
+
+    @staticmethod
+    def movimientos(cliente_id, despues=None, limite=50):
+        """
+        Libro cronológico de cargos (deudas) y abonos del cliente con el saldo
+        acumulado, en una sola consulta con SUM() OVER sobre la unión de ambas
+        tablas. Paginado por keyset: despues es la clave (fecha, orden, id) de
+        la última fila ya entregada. Devuelve hasta limite filas como dicts.
+        """
+        sql = f"""
+            SELECT tipo, orden, id, deuda_id, fecha, descripcion, cargo, abono, saldo
+            FROM (
+                SELECT m.*, SUM(m.cargo - m.abono) OVER (
+                    ORDER BY m.fecha, m.orden, m.id ROWS UNBOUNDED PRECEDING
+                ) AS saldo
+                FROM (
+                    SELECT 'DEUDA' AS tipo, {EstadoCuentaService.ORDEN_DEUDA} AS orden, d.id, d.id AS deuda_id, d.fecha,
+                           d.descripcion, d.monto AS cargo, 0 AS abono
+                    FROM {Deuda._meta.db_table} d
+                    WHERE d.cliente_id = %s
+                    UNION ALL
+                    SELECT 'ABONO', {EstadoCuentaService.ORDEN_ABONO}, a.id, a.deuda_id, a.fecha,
+                           a.descripcion, 0, a.monto
+                    FROM {Abono._meta.db_table} a
+                    JOIN {Deuda._meta.db_table} d ON d.id = a.deuda_id
+                    WHERE d.cliente_id = %s
+                ) m
+            ) libro
+        """
+        parametros = [cliente_id, cliente_id]
+
+        # El saldo acumulado se calcula sobre todo el libro y luego se filtra
+        # la página, para que cada fila conserve el saldo correcto
+        if despues:
+            fecha, orden, id_ = despues
+            sql += """
+            WHERE fecha > %s
+               OR (fecha = %s AND (orden > %s OR (orden = %s AND id > %s)))
+            """
+            parametros += [fecha, fecha, orden, orden, id_]
+
+        sql += " ORDER BY fecha, orden, id LIMIT %s"
+        parametros.append(limite)
+
+        campo_fecha = models.DateField()
+        campo_monto = models.DecimalField(max_digits=12, decimal_places=2)
+        centavos = Decimal('0.01')
+
+        def importe(valor):
+            # SQLite puede devolver float o int; se normaliza a Decimal con 2 decimales
+            return campo_monto.to_python(str(valor)).quantize(centavos)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            return [
+                {
+                    'tipo': tipo,
+                    'orden': orden,
+                    'id': id_,
+                    'deuda': deuda_id,
+                    'fecha': campo_fecha.to_python(fecha),
+                    'descripcion': descripcion,
+                    'cargo': importe(cargo),
+                    'abono': importe(abono),
+                    'saldo': importe(saldo),
+                }
+                for tipo, orden, id_, deuda_id, fecha, descripcion, cargo, abono, saldo in cursor.fetchall()
+            ]
+
+
+class SaldoDiarioService:
+
+    AGRUPACIONES = ('dia', 'mes')
+
+    @staticmethod
+    def registrar(fecha=None, por_cliente=False):
+        """
+        Guarda la foto de la cartera del día: saldo pendiente y vencido de
+        las deudas abiertas (una pasada agrupada por cliente) y lo cobrado en
+        abonos de ese día. Los totales salen de sumar las filas por cliente.
+        Los saldos son siempre los actuales, así que fecha solo debe ser el
+        día en curso o, si el comando corre pasada la medianoche, el anterior.
+        Si el día ya tenía foto la reemplaza. Devuelve la fila de totales.
+        """
+        fecha = fecha or timezone.localdate()
+        vencida = DeudaQuerySet.filtro_vencidas(fecha)
+        cero = Decimal('0.00')
+
+        filas = {}
+        deudas = Deuda.objects.filter(pagada=False).order_by().values('cliente_id').annotate(
+            saldo_pendiente=Sum('saldo'),
+            saldo_vencido=Sum('saldo', filter=vencida),
+            deudas_activas=Count('id'),
+            deudas_vencidas=Count('id', filter=vencida),
+        )
+        for fila in deudas:
+            filas[fila.pop('cliente_id')] = fila
+
+        cobrado = Abono.objects.filter(fecha=fecha).order_by().values(
+            'deuda__cliente_id'
+        ).annotate(total=Sum('monto')).values_list('deuda__cliente_id', 'total')
+        for cliente_id, total in cobrado:
+            filas.setdefault(cliente_id, {})['total_cobrado'] = total
+
+        saldos = []
+        for cliente_id, valores in filas.items():
+            saldos.append(SaldoDiarioCartera(
+                fecha=fecha,
+                cliente_id=cliente_id,
+                saldo_pendiente=valores.get('saldo_pendiente') or cero,
+                saldo_vencido=valores.get('saldo_vencido') or cero,
+                total_cobrado=valores.get('total_cobrado') or cero,
+                deudas_activas=valores.get('deudas_activas', 0),
+                deudas_vencidas=valores.get('deudas_vencidas', 0),
+            ))
+
+        total = SaldoDiarioCartera(fecha=fecha)
+        for saldo in saldos:
+            for campo in SaldoDiarioCartera.CAMPOS:
+                setattr(total, campo, getattr(total, campo) + getattr(saldo, campo))
+
+        with transaction.atomic():
+            SaldoDiarioCartera.objects.filter(fecha=fecha).delete()
+            SaldoDiarioCartera.objects.bulk_create([total] + (saldos if por_cliente else []), batch_size=1000)
+
+        return total
+
+    @staticmethod
+    def tendencia(desde, hasta, cliente_id=None, agrupar='dia'):
+        """
+        Fotos diarias entre desde y hasta (ambas incluidas) del total de la
+        cartera o de un cliente. Con agrupar='mes' devuelve una fila por mes:
+        los saldos de la última foto del mes (cierre) y lo cobrado en el mes.
+        """
+        saldos = SaldoDiarioCartera.objects.filter(
+            cliente_id=cliente_id, fecha__gte=desde, fecha__lte=hasta
+        ).order_by('fecha').values('fecha', *SaldoDiarioCartera.CAMPOS)
+
+        if agrupar == 'dia':
+            return list(saldos)
+
+        meses = {}
+        for saldo in saldos:
+            mes = saldo['fecha'].replace(day=1)
+            cobrado = meses[mes]['total_cobrado'] if mes in meses else Decimal('0.00')
+            # Las fotos vienen en orden: la última del mes queda como cierre
+            meses[mes] = {**saldo, 'mes': mes, 'total_cobrado': cobrado + saldo['total_cobrado']}
+        return list(meses.values())
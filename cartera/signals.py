@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cliente, Deuda, Abono, VersionCartera
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Deuda)
+@receiver(post_delete, sender=Deuda)
+@receiver(post_save, sender=Abono)
+@receiver(post_delete, sender=Abono)
+def invalidar_cache_cartera(sender, **kwargs):
+    """
+    Cualquier escritura en la cartera incrementa su versión al confirmarse
+    la transacción; la versión forma parte de las claves de caché
+    (estadísticas, reportes). Los borrados en cascada
+    también emiten post_delete. Las operaciones masivas (update, bulk_create)
+    no emiten señales y deben llamar a VersionCartera.incrementar().
+    """
+    VersionCartera.incrementar()
@@ -1,3 +1,848 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from threading import Barrier, Thread
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from almacen_refrigas.pruebas import PlanConsultaMixin
+
+from .models import (
+    Cliente, ClienteResumen, Deuda, Abono, SaldoDiarioCartera, VersionCartera, TerminoBusquedaCliente,
+    limite_prefijo,
+)
+from .services import AbonoService, AbonoInvalido, SaldoDiarioService
+
+
+class DeudaConSaldoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.cliente = Cliente.objects.create(nombre='Ana', correo='ana@example.com')
+        cls.vencida = Deuda.objects.create(
+            cliente=cls.cliente, monto=Decimal('100.00'),
+            fecha_vencimiento=hoy - timedelta(days=10)
+        )
+        cls.al_dia = Deuda.objects.create(
+            cliente=cls.cliente, monto=Decimal('50.00'),
+            fecha_vencimiento=hoy + timedelta(days=5)
+        )
+        Abono.objects.create(deuda=cls.vencida, monto=Decimal('30.00'))
+        Abono.objects.create(deuda=cls.vencida, monto=Decimal('20.00'))
+
+    def test_anotaciones_coinciden_con_metodos_del_modelo(self):
+        deudas = {d.id: d for d in Deuda.objects.con_saldo()}
+
+        for deuda in Deuda.objects.all():
+            anotada = deudas[deuda.id]
+            self.assertEqual(anotada.saldo_restante, deuda.calcular_saldo_restante())
+            self.assertEqual(anotada.total_abonado, deuda.monto - deuda.calcular_saldo_restante())
+            self.assertEqual(anotada.esta_vencida, deuda.esta_vencida())
+
+        self.assertEqual(deudas[self.vencida.id].dias_vencidos, 10)
+        self.assertIsNone(deudas[self.al_dia.id].dias_vencidos)
+
+    def test_consultas_constantes_en_vistas_de_cartera(self):
+        for i in range(10):
+            Deuda.objects.create(cliente=self.cliente, monto=Decimal('10.00'))
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse('deudas_con_saldo'))
+        # Versión de la cartera + los dos agregados
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(reverse('estadisticas_cartera'))
+
+        self.assertEqual(respuesta.json()['deudas_vencidas'], 1)
+
+
+class SaldoDesnormalizadoTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Luis', correo='luis@example.com')
+        self.deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('100.00'))
+
+    def test_saldo_inicial_igual_al_monto(self):
+        self.assertEqual(self.deuda.saldo, Decimal('100.00'))
+        self.assertEqual(self.deuda.total_abonado, Decimal('0.00'))
+
+    def test_crear_editar_y_borrar_abono(self):
+        abono = Abono.objects.create(deuda=self.deuda, monto=Decimal('100.00'))
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('0.00'))
+        self.assertTrue(self.deuda.pagada)
+
+        abono.monto = Decimal('40.00')
+        abono.save()
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.total_abonado, Decimal('40.00'))
+        self.assertEqual(self.deuda.saldo, Decimal('60.00'))
+        self.assertFalse(self.deuda.pagada)
+
+        abono.delete()
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('100.00'))
+        self.assertFalse(self.deuda.pagada)
+
+    def test_editar_monto_recalcula_pagada(self):
+        Abono.objects.create(deuda=self.deuda, monto=Decimal('100.00'))
+        self.deuda.refresh_from_db()
+        self.assertTrue(self.deuda.pagada)
+
+        self.deuda.monto = Decimal('150.00')
+        self.deuda.save()
+        self.assertEqual(self.deuda.saldo, Decimal('50.00'))
+        self.assertFalse(self.deuda.pagada)
+        self.assertFalse(Deuda.objects.get(pk=self.deuda.pk).pagada)
+
+        self.deuda.monto = Decimal('100.00')
+        self.deuda.save()
+        self.assertEqual(self.deuda.saldo, Decimal('0.00'))
+        self.assertTrue(self.deuda.pagada)
+
+    def test_marcar_pagada_se_conserva(self):
+        self.deuda.pagada = True
+        self.deuda.save()
+        self.assertTrue(self.deuda.pagada)
+
+        self.deuda.descripcion = 'Condonada'
+        self.deuda.save()
+        self.assertTrue(Deuda.objects.get(pk=self.deuda.pk).pagada)
+
+    def test_monto_como_texto(self):
+        abono = Abono.objects.create(deuda=self.deuda, monto='5')
+        self.assertEqual(abono.monto, Decimal('5'))
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('95.00'))
+
+    def test_mover_abono_entre_deudas(self):
+        otra = Deuda.objects.create(cliente=self.cliente, monto=Decimal('50.00'))
+        abono = Abono.objects.create(deuda=self.deuda, monto=Decimal('30.00'))
+
+        abono.deuda = otra
+        abono.save()
+
+        self.deuda.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('100.00'))
+        self.assertEqual(otra.saldo, Decimal('20.00'))
+
+    def test_editar_deuda_no_pisa_saldos(self):
+        desactualizada = Deuda.objects.get(pk=self.deuda.pk)
+        Abono.objects.create(deuda=self.deuda, monto=Decimal('30.00'))
+
+        desactualizada.monto = Decimal('120.00')
+        desactualizada.save()
+
+        self.assertEqual(desactualizada.total_abonado, Decimal('30.00'))
+        self.assertEqual(desactualizada.saldo, Decimal('90.00'))
+
+    def test_recalcular_saldos(self):
+        Abono.objects.create(deuda=self.deuda, monto=Decimal('25.00'))
+        Deuda.objects.update(total_abonado=0, saldo=0)
+
+        call_command('recalcular_saldos', stdout=StringIO())
+
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.total_abonado, Decimal('25.00'))
+        self.assertEqual(self.deuda.saldo, Decimal('75.00'))
+
+
+class RegistroAbonoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+        self.cliente = Cliente.objects.create(nombre='Rosa', correo='rosa@example.com')
+        self.deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('100.00'))
+
+    def test_valida_monto_contra_el_saldo(self):
+        AbonoService.registrar_abono(Abono(deuda=self.deuda, monto='60.00'))
+
+        for monto in ('50.00', '0', '-5', 'abc', '1.001', None):
+            with self.assertRaises(AbonoInvalido):
+                AbonoService.registrar_abono(Abono(deuda=self.deuda, monto=monto))
+
+        AbonoService.registrar_abono(Abono(deuda=self.deuda, monto='40.00'))
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('0.00'))
+        self.assertTrue(self.deuda.pagada)
+        self.assertEqual(Abono.objects.count(), 2)
+
+    def test_api_rechaza_sobrepago(self):
+        self.client.force_login(self.usuario)
+
+        respuesta = self.client.post('/api/abonos/', {'deuda': self.deuda.id, 'monto': '150.00'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('monto', respuesta.json())
+
+        respuesta = self.client.post('/api/abonos/', {'deuda': self.deuda.id, 'monto': '25.00'})
+        self.assertEqual(respuesta.status_code, 201)
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('75.00'))
+
+    def test_api_rechaza_sobrepago_al_editar(self):
+        self.client.force_login(self.usuario)
+        abono = AbonoService.registrar_abono(Abono(deuda=self.deuda, monto='60.00'))
+        url = f'/api/abonos/{abono.id}/'
+
+        respuesta = self.client.patch(url, {'monto': '120.00'}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('100.00', respuesta.json()['monto'][0])
+
+        # Hasta el saldo más lo ya abonado por este abono
+        respuesta = self.client.patch(url, {'monto': '100.00'}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('0.00'))
+        self.assertTrue(self.deuda.pagada)
+
+        # Pasarlo a otra deuda exige el monto completo dentro de su saldo
+        otra = Deuda.objects.create(cliente=self.cliente, monto=Decimal('30.00'))
+        respuesta = self.client.patch(url, {'deuda': otra.id}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('0.00'))
+
+    # El formulario con errores renderiza el admin; sin collectstatic no hay manifiesto
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_rechaza_sobrepago_al_editar(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        self.client.force_login(admin)
+        abono = AbonoService.registrar_abono(Abono(deuda=self.deuda, monto='60.00'))
+        url = reverse('admin:cartera_abono_change', args=[abono.id])
+        datos = {'deuda': self.deuda.id, 'descripcion': 'Abono a deuda'}
+
+        respuesta = self.client.post(url, {**datos, 'monto': '150.00'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'no puede ser mayor al saldo')
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('40.00'))
+
+        respuesta = self.client.post(url, {**datos, 'monto': '90.00'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.deuda.refresh_from_db()
+        self.assertEqual(self.deuda.saldo, Decimal('10.00'))
+
+        # Con el formulario ya validado, el servicio vuelve a comprobar con la deuda bloqueada
+        with self.assertRaises(AbonoInvalido):
+            AbonoService.actualizar_abono(Abono(pk=abono.pk, deuda=self.deuda, monto='101.00'))
+
+
+class AplicarPagoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero', password='cajero123')
+        self.client.force_login(self.usuario)
+        hoy = timezone.now().date()
+        self.cliente = Cliente.objects.create(nombre='Nora', correo='nora@example.com')
+        self.sin_vencimiento = Deuda.objects.create(cliente=self.cliente, monto=Decimal('40.00'))
+        self.reciente = Deuda.objects.create(
+            cliente=self.cliente, monto=Decimal('50.00'), fecha_vencimiento=hoy - timedelta(days=5)
+        )
+        self.antigua = Deuda.objects.create(
+            cliente=self.cliente, monto=Decimal('30.00'), fecha_vencimiento=hoy - timedelta(days=60)
+        )
+        Abono.objects.create(deuda=self.antigua, monto=Decimal('10.00'))
+        self.url = f'/api/clientes/{self.cliente.id}/aplicar_pago/'
+
+    def saldos(self):
+        return {
+            deuda.id: (deuda.total_abonado, deuda.saldo, deuda.pagada)
+            for deuda in Deuda.objects.filter(cliente=self.cliente)
+        }
+
+    def test_reparte_primero_lo_mas_vencido(self):
+        version = VersionCartera.actual()
+
+        # Bloqueo + saldos + bulk_create + bulk_update + resumen (bloqueo,
+        # cálculo y UPDATE), más el savepoint; la versión se incrementa al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(9):
+                aplicados = AbonoService.aplicar_pago(self.cliente.id, '60.00')
+
+        self.assertEqual(
+            [(deuda.id, abono.monto) for deuda, abono in aplicados],
+            [(self.antigua.id, Decimal('20.00')), (self.reciente.id, Decimal('40.00'))]
+        )
+        self.assertEqual(self.saldos(), {
+            self.antigua.id: (Decimal('30.00'), Decimal('0.00'), True),
+            self.reciente.id: (Decimal('40.00'), Decimal('10.00'), False),
+            self.sin_vencimiento.id: (Decimal('0.00'), Decimal('40.00'), False),
+        })
+        self.assertGreater(VersionCartera.actual(), version)
+
+        # Los saldos coinciden con los que se reconstruyen desde los abonos
+        antes = self.saldos()
+        Deuda.objects.all().recalcular_saldos()
+        self.assertEqual(self.saldos(), antes)
+
+    def test_api_y_pago_mayor_a_la_deuda(self):
+        respuesta = self.client.post(self.url, {'monto': '200.00'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('110.00', respuesta.json()['monto'][0])
+        self.assertEqual(Abono.objects.count(), 1)
+
+        respuesta = self.client.post(self.url, {'monto': '110.00', 'descripcion': 'Pago total'})
+        self.assertEqual(respuesta.status_code, 201)
+        datos = respuesta.json()
+        self.assertEqual(datos['monto'], '110.00')
+        self.assertEqual([a['deuda'] for a in datos['abonos']],
+                         [self.antigua.id, self.reciente.id, self.sin_vencimiento.id])
+        self.assertTrue(all(a['pagada'] for a in datos['abonos']))
+        self.assertEqual(Abono.objects.filter(descripcion='Pago total').count(), 3)
+
+
+class AbonosConcurrentesTests(TransactionTestCase):
+    HILOS = 8
+    INTENTOS_POR_HILO = 5
+
+    def test_pagos_simultaneos_no_sobrepagan(self):
+        cliente = Cliente.objects.create(nombre='Pablo', correo='pablo@example.com')
+        deuda = Deuda.objects.create(cliente=cliente, monto=Decimal('100.00'))
+        barrera = Barrier(self.HILOS)
+        resultados = []
+
+        def pagar():
+            try:
+                barrera.wait()
+                for _ in range(self.INTENTOS_POR_HILO):
+                    try:
+                        AbonoService.registrar_abono(Abono(deuda_id=deuda.id, monto=Decimal('7.00')))
+                        resultados.append(True)
+                    except AbonoInvalido:
+                        resultados.append(False)
+            finally:
+                connection.close()
+
+        hilos = [Thread(target=pagar) for _ in range(self.HILOS)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        # 100 / 7: solo caben 14 abonos, el resto debe rechazarse
+        self.assertEqual(len(resultados), self.HILOS * self.INTENTOS_POR_HILO)
+        self.assertEqual(resultados.count(True), 14)
+
+        deuda.refresh_from_db()
+        self.assertEqual(deuda.total_abonado, Decimal('98.00'))
+        self.assertEqual(deuda.saldo, Decimal('2.00'))
+        self.assertEqual(Abono.objects.filter(deuda=deuda).count(), 14)
+
+        # Los bloqueos se esperan, no se reintentan: 40 intentos tardan décimas de segundo
+        self.assertLess(duracion, 10)
+
+
+class EstadisticasEnCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(nombre='Eva', correo='eva@example.com')
+        self.deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('100.00'))
+
+    def obtener(self):
+        return {
+            clave: Decimal(valor)
+            for clave, valor in self.client.get(reverse('estadisticas_cartera')).json().items()
+        }
+
+    def test_se_sirven_desde_cache_hasta_que_cambian_los_datos(self):
+        self.assertEqual(self.obtener()['saldo_pendiente'], Decimal('100.00'))
+
+        with self.assertNumQueries(1):
+            self.obtener()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            abono = Abono.objects.create(deuda=self.deuda, monto=Decimal('30.00'))
+        self.assertEqual(self.obtener()['saldo_pendiente'], Decimal('70.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            abono.delete()
+        self.assertEqual(self.obtener()['saldo_pendiente'], Decimal('100.00'))
+
+    def test_vencidas_cambian_de_un_dia_a_otro(self):
+        hoy = timezone.localdate()
+        self.deuda.fecha_vencimiento = hoy
+        self.deuda.save()
+        self.assertEqual(self.obtener()['deudas_vencidas'], 0)
+
+        with mock.patch('cartera.views.timezone.localdate', return_value=hoy + timedelta(days=1)):
+            self.assertEqual(self.obtener()['deudas_vencidas'], 1)
+
+    def test_version_se_incrementa_al_confirmar(self):
+        version = VersionCartera.actual()
+
+        with self.captureOnCommitCallbacks() as pendientes:
+            Abono.objects.create(deuda=self.deuda, monto=Decimal('30.00'))
+            # La fila de la versión no se toca dentro de la transacción
+            self.assertEqual(VersionCartera.actual(), version)
+
+        for pendiente in pendientes:
+            pendiente()
+        self.assertGreater(VersionCartera.actual(), version)
+
+    def test_borrado_en_cascada_invalida(self):
+        self.assertEqual(self.obtener()['total_clientes'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.delete()
+
+        estadisticas = self.obtener()
+        self.assertEqual(estadisticas['total_clientes'], 0)
+        self.assertEqual(estadisticas['total_deudas'], Decimal('0.00'))
+
+    def test_recalcular_saldos_invalida(self):
+        self.obtener()
+        version = VersionCartera.actual()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Deuda.objects.all().recalcular_saldos()
+
+        self.assertGreater(VersionCartera.actual(), version)
+
+
+class ListadoDeudasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.ana = Cliente.objects.create(nombre='Ana', correo='ana@example.com')
+        cls.luis = Cliente.objects.create(nombre='Luis', correo='luis@example.com')
+        Deuda.objects.bulk_create([
+            Deuda(cliente=cls.ana, monto=Decimal(10 + i), saldo=Decimal(10 + i))
+            for i in range(30)
+        ])
+        cls.vencida = Deuda.objects.create(
+            cliente=cls.luis, monto=Decimal('80.00'),
+            fecha_vencimiento=hoy - timedelta(days=3)
+        )
+        cls.pagada = Deuda.objects.create(cliente=cls.luis, monto=Decimal('20.00'), pagada=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_paginado_en_el_servidor(self):
+        respuesta = self.client.get(reverse('listado_deudas'))
+        self.assertEqual(len(respuesta.context['deudas']), 25)
+        self.assertEqual(respuesta.context['pagina'].paginator.count, 32)
+
+        respuesta = self.client.get(reverse('listado_deudas'), {'page': 2})
+        self.assertEqual(len(respuesta.context['deudas']), 7)
+
+        respuesta = self.client.get(reverse('listado_deudas'), {'por_pagina': 1000})
+        self.assertEqual(len(respuesta.context['deudas']), 32)
+
+    def test_filtros_y_orden(self):
+        def ids(**parametros):
+            respuesta = self.client.get(reverse('listado_deudas'), parametros)
+            return [deuda.id for deuda in respuesta.context['deudas']]
+
+        self.assertEqual(ids(cliente='luis', orden='monto'), [self.pagada.id, self.vencida.id])
+        self.assertEqual(ids(estado='vencida'), [self.vencida.id])
+        self.assertEqual(ids(estado='pagada'), [self.pagada.id])
+        self.assertEqual(ids(orden='-saldo')[0], self.vencida.id)
+        self.assertEqual(ids(desde='2000-01-01', hasta='2000-12-31'), [])
+
+    def test_consultas_constantes_por_pagina(self):
+        self.client.get(reverse('listado_deudas'))
+        # Versión de la cartera + conteo del paginador + página de deudas
+        with self.assertNumQueries(3):
+            self.client.get(reverse('listado_deudas'), {'page': 2})
+
+    def test_modal_de_abono_bajo_demanda(self):
+        respuesta = self.client.get(
+            reverse('detalle_abono_deuda', args=[self.vencida.id]),
+            {'volver': '/cartera/?page=2'}
+        )
+
+        self.assertContains(respuesta, reverse('agregar_abono', args=[self.vencida.id]))
+        self.assertContains(respuesta, 'value="/cartera/?page=2"')
+        self.assertEqual(respuesta.context['deuda'].saldo_restante, Decimal('80.00'))
+
+    def test_abono_vuelve_a_la_pagina_del_listado(self):
+        respuesta = self.client.post(
+            reverse('agregar_abono', args=[self.vencida.id]),
+            {'monto': '30.00', 'volver': '/cartera/?page=2'}
+        )
+        self.assertRedirects(respuesta, '/cartera/?page=2', fetch_redirect_response=False)
+
+        respuesta = self.client.post(
+            reverse('marcar_como_pagada', args=[self.vencida.id]),
+            {'volver': 'https://externo.example.com/'}
+        )
+        self.assertRedirects(respuesta, reverse('listado_deudas'), fetch_redirect_response=False)
+
+
+class PaginacionApiTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cobrador', password='cobrador123')
+        self.client.force_login(self.usuario)
+        Cliente.objects.bulk_create([
+            Cliente(nombre=f'Cliente {i}', correo=f'cliente{i}@example.com')
+            for i in range(5)
+        ])
+
+    def test_clientes_paginados_por_cursor(self):
+        respuesta = self.client.get('/api/clientes/', {'page_size': 2})
+        datos = respuesta.json()
+
+        self.assertEqual([c['nombre'] for c in datos['results']], ['Cliente 0', 'Cliente 1'])
+        self.assertIsNotNone(datos['next'])
+
+        nombres = [c['nombre'] for c in datos['results']]
+        while datos['next']:
+            datos = self.client.get(datos['next']).json()
+            nombres += [c['nombre'] for c in datos['results']]
+
+        self.assertEqual(nombres, [f'Cliente {i}' for i in range(5)])
+
+
+class EstadoCuentaTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cobrador', password='cobrador123')
+        self.client.force_login(self.usuario)
+        self.cliente = Cliente.objects.create(nombre='Marta', correo='marta@example.com')
+        otro = Cliente.objects.create(nombre='Otro', correo='otro@example.com')
+        Deuda.objects.create(cliente=otro, monto=Decimal('999.00'))
+
+        self.primera = Deuda.objects.create(cliente=self.cliente, monto=Decimal('100.00'))
+        self.segunda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('50.50'))
+        Abono.objects.create(deuda=self.primera, monto=Decimal('30.00'))
+        Abono.objects.create(deuda=self.segunda, monto=Decimal('0.50'))
+        # Movimientos de días distintos para comprobar el orden cronológico
+        ayer = timezone.now().date() - timedelta(days=1)
+        Deuda.objects.filter(pk=self.primera.pk).update(fecha=ayer)
+        self.url = f'/api/clientes/{self.cliente.id}/estado_cuenta/'
+
+    def test_libro_con_saldo_acumulado(self):
+        datos = self.client.get(self.url).json()
+
+        self.assertEqual(datos['cliente']['nombre'], 'Marta')
+        self.assertIsNone(datos['next'])
+        self.assertEqual(
+            [(m['tipo'], m['deuda'], Decimal(m['saldo'])) for m in datos['results']],
+            [
+                ('DEUDA', self.primera.id, Decimal('100.00')),
+                ('DEUDA', self.segunda.id, Decimal('150.50')),
+                ('ABONO', self.primera.id, Decimal('120.50')),
+                ('ABONO', self.segunda.id, Decimal('120.00')),
+            ]
+        )
+        self.assertEqual(datos['results'][2]['abono'], '30.00')
+        self.assertEqual(datos['results'][2]['cargo'], '0.00')
+
+    def test_paginado_por_keyset_con_una_consulta_por_pagina(self):
+        completo = self.client.get(self.url).json()['results']
+
+        # Sesión y usuario + cliente + página del libro
+        with self.assertNumQueries(4):
+            datos = self.client.get(self.url, {'page_size': 3}).json()
+        movimientos = datos['results']
+        self.assertEqual(len(movimientos), 3)
+
+        datos = self.client.get(datos['next']).json()
+        movimientos += datos['results']
+        self.assertIsNone(datos['next'])
+        self.assertEqual(movimientos, completo)
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(self.url, {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class AntiguedadCarteraApiTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('gerente', password='gerente123')
+        self.client.force_login(self.usuario)
+        hoy = timezone.now().date()
+        cliente = Cliente.objects.create(nombre='Iris', correo='iris@example.com')
+        for monto, dias_vencidos in [('15.00', None), ('25.00', 5), ('35.00', 45), ('45.00', 120)]:
+            Deuda.objects.create(
+                cliente=cliente, monto=Decimal(monto),
+                fecha_vencimiento=None if dias_vencidos is None else hoy - timedelta(days=dias_vencidos)
+            )
+        Abono.objects.create(deuda=Deuda.objects.get(monto=Decimal('45.00')), monto=Decimal('5.00'))
+
+    def test_saldos_por_tramo_y_totales(self):
+        datos = self.client.get('/api/deudas/antiguedad/').json()
+
+        esperado = {
+            'por_vencer': Decimal('15.00'), 'de_1_a_30': Decimal('25.00'), 'de_31_a_60': Decimal('35.00'),
+            'de_61_a_90': Decimal('0.00'), 'mas_de_90': Decimal('40.00'), 'saldo_total': Decimal('115.00'),
+        }
+        self.assertEqual(len(datos['clientes']), 1)
+        self.assertEqual(datos['clientes'][0]['nombre'], 'Iris')
+        self.assertEqual({t: Decimal(v) for t, v in datos['totales'].items()}, esperado)
+
+    def test_fecha_de_corte_invalida(self):
+        respuesta = self.client.get('/api/deudas/antiguedad/', {'fecha_corte': '30/06/2024'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class BusquedaClientesTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('vendedor', password='vendedor123')
+        self.client.force_login(self.usuario)
+        self.pena = Cliente.objects.create(nombre='José Peña López', correo='jpena@refri.com', telefono='300-123 4567')
+        self.pedro = Cliente.objects.create(nombre='Pedro Ruiz', correo='pruiz@example.com')
+        self.maria = Cliente.objects.create(nombre='María Gómez', correo='maria@example.com', telefono='3109876543')
+
+    def buscar(self, q, **parametros):
+        datos = self.client.get('/api/clientes/buscar/', {'q': q, **parametros}).json()
+        return [c['nombre'] for c in datos['results']]
+
+    def test_prefijo_sin_tildes_en_nombre_correo_y_telefono(self):
+        self.assertEqual(self.buscar('pe'), ['José Peña López', 'Pedro Ruiz'])
+        self.assertEqual(self.buscar('PEÑA'), ['José Peña López'])
+        self.assertEqual(self.buscar('gomez mar'), ['María Gómez'])
+        self.assertEqual(self.buscar('pruiz@exa'), ['Pedro Ruiz'])
+        self.assertEqual(self.buscar('3001234'), ['José Peña López'])
+        self.assertEqual(self.buscar('300-123'), ['José Peña López'])
+        self.assertEqual(self.buscar('ruiz gomez'), [])
+        self.assertEqual(self.buscar(''), [])
+
+    def test_limite_y_respuesta_compacta(self):
+        datos = self.client.get('/api/clientes/buscar/', {'q': 'example', 'limite': 1}).json()
+        self.assertEqual(len(datos['results']), 1)
+        self.assertEqual(set(datos['results'][0]), {'id', 'nombre', 'correo', 'telefono', 'direccion'})
+
+    def test_editar_cliente_reindexa(self):
+        self.pedro.nombre = 'Pedro Zapata'
+        self.pedro.save()
+
+        self.assertEqual(self.buscar('zapa'), ['Pedro Zapata'])
+        self.assertEqual(self.buscar('ruiz'), [])
+
+        self.pedro.delete()
+        self.assertFalse(TerminoBusquedaCliente.objects.filter(cliente_id=self.pedro.id).exists())
+
+    def test_limite_prefijo(self):
+        self.assertEqual(limite_prefijo('ana'), 'anb')
+        self.assertEqual(limite_prefijo('an9'), 'ana')
+        self.assertEqual(limite_prefijo('az'), 'b')
+        self.assertIsNone(limite_prefijo('zz'))
+
+
+class ResumenClienteTests(TestCase):
+
+    def setUp(self):
+        hoy = timezone.now().date()
+        self.hace_10 = hoy - timedelta(days=10)
+        self.cliente = Cliente.objects.create(nombre='Olga', correo='olga@example.com')
+        self.otro = Cliente.objects.create(nombre='Raúl', correo='raul@example.com')
+        self.deuda = Deuda.objects.create(
+            cliente=self.cliente, monto=Decimal('100.00'), fecha_vencimiento=self.hace_10
+        )
+        Deuda.objects.create(cliente=self.cliente, monto=Decimal('50.00'), fecha_vencimiento=hoy)
+
+    def resumen(self, cliente):
+        return ClienteResumen.objects.values(*ClienteResumen.CAMPOS).get(cliente=cliente)
+
+    def assertResumenCoincide(self):
+        self.assertEqual(ClienteResumen.diferencias(), [])
+
+    def test_se_mantiene_con_deudas_y_abonos(self):
+        self.assertEqual(self.resumen(self.cliente), {
+            'total_deudas': 2, 'deudas_activas': 2, 'monto_total': Decimal('150.00'),
+            'monto_pagado': Decimal('0.00'), 'saldo_pendiente': Decimal('150.00'),
+            'vencimiento_mas_antiguo': self.hace_10,
+        })
+
+        abono = Abono.objects.create(deuda=self.deuda, monto=Decimal('100.00'))
+        resumen = self.resumen(self.cliente)
+        self.assertEqual((resumen['deudas_activas'], resumen['saldo_pendiente']), (1, Decimal('50.00')))
+        self.assertEqual(resumen['vencimiento_mas_antiguo'], timezone.now().date())
+
+        abono.delete()
+        self.assertEqual(self.resumen(self.cliente)['saldo_pendiente'], Decimal('150.00'))
+
+        # Cambiar la deuda de cliente actualiza los dos resúmenes
+        self.deuda.cliente = self.otro
+        self.deuda.save()
+        self.assertEqual(self.resumen(self.cliente)['total_deudas'], 1)
+        self.assertEqual(self.resumen(self.otro)['saldo_pendiente'], Decimal('100.00'))
+
+        self.deuda.delete()
+        self.assertEqual(self.resumen(self.otro)['total_deudas'], 0)
+        self.assertResumenCoincide()
+
+    def test_operaciones_masivas(self):
+        AbonoService.aplicar_pago(self.cliente.id, '120.00')
+        self.assertEqual(self.resumen(self.cliente)['saldo_pendiente'], Decimal('30.00'))
+        self.assertResumenCoincide()
+
+        # Borrado masivo de los abonos de la deuda abierta: recalcular_saldos
+        # reconstruye sus saldos y el resumen
+        Abono.objects.exclude(deuda=self.deuda).delete()
+        Deuda.objects.all().recalcular_saldos()
+        self.assertEqual(self.resumen(self.cliente)['saldo_pendiente'], Decimal('50.00'))
+        self.assertResumenCoincide()
+
+    def test_bloquea_el_resumen_antes_de_calcular(self):
+        with CaptureQueriesContext(connection) as consultas:
+            Abono.objects.create(deuda=self.deuda, monto=Decimal('10.00'))
+
+        sql = [consulta['sql'] for consulta in consultas.captured_queries]
+        tabla = ClienteResumen._meta.db_table
+        bloqueo = next(i for i, s in enumerate(sql) if tabla in s)
+        calculo = next(i for i, s in enumerate(sql) if 'GROUP BY' in s)
+        self.assertLess(bloqueo, calculo)
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', sql[bloqueo])
+        else:
+            self.assertTrue(sql[bloqueo].startswith(f'UPDATE "{tabla}"'))
+
+    def test_comando_corrige_diferencias(self):
+        ClienteResumen.objects.filter(cliente=self.cliente).update(saldo_pendiente=Decimal('1.00'))
+        ClienteResumen.objects.filter(cliente=self.otro).delete()
+        self.assertEqual(ClienteResumen.diferencias(), [self.cliente.id, self.otro.id])
+
+        salida = StringIO()
+        call_command('verificar_resumen_clientes', '--solo-verificar', stdout=salida)
+        self.assertIn('2 clientes', salida.getvalue())
+        self.assertEqual(len(ClienteResumen.diferencias()), 2)
+
+        call_command('verificar_resumen_clientes', stdout=StringIO())
+        self.assertResumenCoincide()
+        self.assertEqual(self.resumen(self.cliente)['saldo_pendiente'], Decimal('150.00'))
+
+    def test_api_mayores_deudores(self):
+        self.client.force_login(User.objects.create_user('cobrador', password='cobrador123'))
+        grande = Cliente.objects.create(nombre='Grande', correo='grande@example.com')
+        Deuda.objects.create(cliente=grande, monto=Decimal('500.00'))
+
+        with self.assertNumQueries(3):
+            datos = self.client.get('/api/clientes/mayores_deudores/', {'limite': 5}).json()
+
+        self.assertEqual([c['id'] for c in datos['results']], [grande.id, self.cliente.id])
+        self.assertEqual(datos['results'][0]['resumen']['saldo_pendiente'], '500.00')
+
+
+class SaldoDiarioTests(TestCase):
+
+    def setUp(self):
+        hoy = timezone.localdate()
+        self.ana = Cliente.objects.create(nombre='Ana', correo='ana@example.com')
+        self.luis = Cliente.objects.create(nombre='Luis', correo='luis@example.com')
+        vencida = Deuda.objects.create(
+            cliente=self.ana, monto=Decimal('100.00'), fecha_vencimiento=hoy - timedelta(days=5)
+        )
+        Deuda.objects.create(cliente=self.ana, monto=Decimal('40.00'))
+        pagada = Deuda.objects.create(cliente=self.luis, monto=Decimal('25.00'))
+        Abono.objects.create(deuda=vencida, monto=Decimal('30.00'))
+        Abono.objects.create(deuda=pagada, monto=Decimal('25.00'))
+
+    def valores(self, saldo):
+        return tuple(getattr(saldo, campo) for campo in SaldoDiarioCartera.CAMPOS)
+
+    def test_registra_totales_y_filas_por_cliente(self):
+        # Deudas agrupadas + abonos del día, y el reemplazo en una transacción
+        with self.assertNumQueries(6):
+            total = SaldoDiarioService.registrar(por_cliente=True)
+
+        self.assertEqual(self.valores(total), (Decimal('110.00'), Decimal('70.00'), Decimal('55.00'), 2, 1))
+        por_cliente = {
+            saldo.cliente_id: self.valores(saldo)
+            for saldo in SaldoDiarioCartera.objects.filter(cliente__isnull=False)
+        }
+        self.assertEqual(por_cliente, {
+            self.ana.id: (Decimal('110.00'), Decimal('70.00'), Decimal('30.00'), 2, 1),
+            self.luis.id: (Decimal('0.00'), Decimal('0.00'), Decimal('25.00'), 0, 0),
+        })
+
+        # Volver a registrar el día reemplaza la foto
+        call_command('registrar_saldo_diario', stdout=StringIO())
+        self.assertEqual(SaldoDiarioCartera.objects.count(), 1)
+
+    def test_tendencia_por_dia_y_cierre_de_mes(self):
+        SaldoDiarioCartera.objects.bulk_create([
+            SaldoDiarioCartera(fecha=fecha, saldo_pendiente=saldo, total_cobrado=cobrado)
+            for fecha, saldo, cobrado in [
+                (date(2026, 2, 27), Decimal('500.00'), Decimal('10.00')),
+                (date(2026, 2, 28), Decimal('450.00'), Decimal('50.00')),
+                (date(2026, 3, 30), Decimal('300.00'), Decimal('20.00')),
+                (date(2026, 3, 31), Decimal('280.00'), Decimal('20.00')),
+            ]
+        ] + [SaldoDiarioCartera(fecha=date(2026, 3, 31), cliente=self.ana, saldo_pendiente=Decimal('80.00'))])
+
+        dias = SaldoDiarioService.tendencia(date(2026, 2, 28), date(2026, 3, 31))
+        self.assertEqual([d['fecha'] for d in dias], [date(2026, 2, 28), date(2026, 3, 30), date(2026, 3, 31)])
+
+        meses = SaldoDiarioService.tendencia(date(2026, 1, 1), date(2026, 3, 31), agrupar='mes')
+        self.assertEqual(
+            [(m['mes'], m['fecha'], m['saldo_pendiente'], m['total_cobrado']) for m in meses],
+            [
+                (date(2026, 2, 1), date(2026, 2, 28), Decimal('450.00'), Decimal('60.00')),
+                (date(2026, 3, 1), date(2026, 3, 31), Decimal('280.00'), Decimal('40.00')),
+            ]
+        )
+
+        self.client.force_login(User.objects.create_user('gerente', password='gerente123'))
+        datos = self.client.get('/api/deudas/tendencia/', {
+            'desde': '2026-03-01', 'hasta': '2026-03-31', 'cliente': self.ana.id
+        }).json()
+        self.assertEqual([d['fecha'] for d in datos['resultados']], ['2026-03-31'])
+        self.assertEqual(Decimal(str(datos['resultados'][0]['saldo_pendiente'])), Decimal('80.00'))
+
+        respuesta = self.client.get('/api/deudas/tendencia/', {'agrupar': 'semana'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class PlanesDeConsultaTests(PlanConsultaMixin, TestCase):
+
+    def test_deudas_vencidas_usan_indice_parcial(self):
+        hoy = timezone.now().date()
+        self.assertUsaIndice(Deuda.objects.vencidas(), 'deuda_activa_venc_idx')
+        self.assertUsaIndice(
+            Deuda.objects.filter(pagada=False, fecha_vencimiento__lt=hoy),
+            'deuda_activa_venc_idx'
+        )
+
+    def test_busqueda_de_clientes_por_rango_de_termino(self):
+        self.assertUsaIndice(
+            TerminoBusquedaCliente.objects.filter(termino__gte='pe', termino__lt='pf').values('cliente_id'),
+            'termino_cliente_idx'
+        )
+
+    def test_abonos_de_una_deuda(self):
+        self.assertUsaIndice(
+            Abono.objects.filter(deuda_id=1).order_by('fecha'),
+            'abono_deuda_fecha_idx'
+        )
+
+    def test_mayores_deudores_en_orden_del_indice(self):
+        self.assertUsaIndice(
+            ClienteResumen.objects.filter(saldo_pendiente__gt=0).order_by('-saldo_pendiente', 'cliente_id')[:10],
+            'resumen_saldo_idx'
+        )
+
+    def test_tendencia_de_un_cliente_por_rango_de_fechas(self):
+        # SQLite crea el índice de la restricción única con nombre automático
+        self.assertUsaIndice(
+            SaldoDiarioCartera.objects.filter(
+                cliente_id=1, fecha__gte=date(2026, 1, 1), fecha__lte=date(2026, 3, 31)
+            ).order_by('fecha')
+        )
+        self.assertUsaIndice(
+            SaldoDiarioCartera.objects.filter(
+                cliente_id=None, fecha__gte=date(2026, 1, 1), fecha__lte=date(2026, 3, 31)
+            ).order_by('fecha')
+        )
@@ -6,6 +6,7 @@ urlpatterns = [
     path('', views.listado_deudas, name='listado_deudas'),
     path('marcar-pagada/<int:deuda_id>/', views.marcar_como_pagada, name='marcar_como_pagada'),
     path('agregar-abono/<int:deuda_id>/', views.agregar_abono, name='agregar_abono'),
+    path('deuda/<int:deuda_id>/abono/', views.detalle_abono_deuda, name='detalle_abono_deuda'),
     
     # NUEVAS PÁGINAS HTML - GESTIÓN DE DEUDAS Y DEUDORES
     path('crear-deuda/', views.crear_deuda_view, name='crear_deuda'),
@@ -1,21 +1,147 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Sum, Q
+from django.db.models import Count, Sum, Q
 from django.contrib import messages
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from .models import Cliente, Deuda, Abono
-from .serializers import ClienteSerializer, DeudaSerializer, AbonoSerializer
+from rest_framework.utils.urls import replace_query_param
+from almacen_refrigas.pagination import PaginacionCursor
+from .models import Cliente, ClienteResumen, Deuda, DeudaQuerySet, Abono, VersionCartera
+from .serializers import (
+    ClienteSerializer, ClienteBusquedaSerializer, DeudaSerializer, AbonoSerializer,
+    MovimientoEstadoCuentaSerializer,
+)
+from .services import AbonoService, AbonoInvalido, EstadoCuentaService, SaldoDiarioService
 from django.utils import timezone
 from decimal import Decimal
 from django.http import JsonResponse  
+from django.core.paginator import Paginator
+from django.utils.http import url_has_allowed_host_and_scheme
+from datetime import date, datetime, timedelta
+import base64
+from django.conf import settings
+from django.core.cache import cache
+
+def codificar_cursor_estado_cuenta(movimiento):
+    clave = f"{movimiento['fecha'].isoformat()}|{movimiento['orden']}|{movimiento['id']}"
+    return base64.urlsafe_b64encode(clave.encode()).decode()
+
+def decodificar_cursor_estado_cuenta(cursor):
+    try:
+        fecha, orden, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(fecha), int(orden), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        raise NotFound('Cursor inválido')
+
+def leer_fecha(request, nombre, por_defecto):
+    if not request.query_params.get(nombre):
+        return por_defecto
+    try:
+        return date.fromisoformat(request.query_params[nombre])
+    except ValueError:
+        raise serializers.ValidationError({nombre: ['Fecha inválida, use AAAA-MM-DD.']})
+
+def leer_limite(request, por_defecto=10, maximo=50):
+    limite = request.query_params.get('limite', '')
+    return min(int(limite), maximo) if limite.isdigit() and int(limite) > 0 else por_defecto
 
 class ClienteViewSet(viewsets.ModelViewSet):
-    queryset = Cliente.objects.all()
+    queryset = Cliente.objects.select_related('resumen')
     serializer_class = ClienteSerializer
+    
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Búsqueda para selectores de clientes: ?q= por prefijo de palabras de
+        nombre, correo o teléfono, sin tildes. Devuelve los primeros ?limite=.
+        """
+        limite = leer_limite(request)
+        
+        clientes = Cliente.objects.buscar(request.query_params.get('q', '')).order_by('nombre', 'id')
+        
+        return Response({
+            'results': ClienteBusquedaSerializer(clientes[:limite], many=True).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def mayores_deudores(self, request):
+        """
+        Los ?limite= clientes con mayor saldo pendiente, leídos en orden del
+        índice de ClienteResumen sin agrupar deudas.
+        """
+        limite = leer_limite(request)
+        
+        resumenes = ClienteResumen.objects.filter(
+            saldo_pendiente__gt=0
+        ).select_related('cliente').order_by('-saldo_pendiente', 'cliente_id')
+        
+        return Response({
+            'results': ClienteSerializer(
+                [resumen.cliente for resumen in resumenes[:limite]], many=True
+            ).data,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def aplicar_pago(self, request, pk=None):
+        """
+        Reparte un pago ({monto, descripcion}) entre las deudas abiertas del
+        cliente, primero las de vencimiento más antiguo.
+        """
+        cliente = self.get_object()
+        try:
+            aplicados = AbonoService.aplicar_pago(
+                cliente.id, request.data.get('monto'), request.data.get('descripcion')
+            )
+        except AbonoInvalido as e:
+            raise serializers.ValidationError({'monto': [str(e)]})
+        
+        return Response({
+            'cliente': cliente.id,
+            'monto': str(sum((abono.monto for _, abono in aplicados), Decimal('0.00'))),
+            'abonos': [
+                {
+                    'id': abono.id,
+                    'deuda': deuda.id,
+                    'monto': str(abono.monto),
+                    'saldo_restante': str(deuda.saldo),
+                    'pagada': deuda.pagada,
+                }
+                for deuda, abono in aplicados
+            ],
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def estado_cuenta(self, request, pk=None):
+        """
+        Cargos y abonos del cliente en orden cronológico con saldo acumulado.
+        Paginado por keyset con ?cursor= y ?page_size=, como el resto de la API.
+        """
+        cliente = self.get_object()
+        limite = PaginacionCursor().get_page_size(request)
+        
+        despues = None
+        if request.query_params.get('cursor'):
+            despues = decodificar_cursor_estado_cuenta(request.query_params['cursor'])
+        
+        # Una fila extra indica si hay página siguiente
+        movimientos = EstadoCuentaService.movimientos(cliente.id, despues, limite + 1)
+        siguiente = None
+        if len(movimientos) > limite:
+            movimientos = movimientos[:limite]
+            siguiente = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                codificar_cursor_estado_cuenta(movimientos[-1])
+            )
+        
+        return Response({
+            'cliente': {'id': cliente.id, 'nombre': cliente.nombre},
+            'next': siguiente,
+            'results': MovimientoEstadoCuentaSerializer(movimientos, many=True).data,
+        })
 
 class DeudaViewSet(viewsets.ModelViewSet):
-    queryset = Deuda.objects.all()
+    queryset = Deuda.objects.con_saldo()
     serializer_class = DeudaSerializer
     
     @action(detail=True, methods=['post'])
@@ -28,50 +154,168 @@ class DeudaViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def saldo_restante(self, request, pk=None):
         deuda = self.get_object()
-        saldo = deuda.calcular_saldo_restante()
-        return Response({'saldo_restante': saldo})
+        return Response({'saldo_restante': deuda.saldo_restante})
+    
+    @action(detail=False, methods=['get'])
+    def antiguedad(self, request):
+        """
+        Antigüedad de la cartera: saldo pendiente por cliente y tramo de días
+        vencidos, con los totales generales. Acepta ?fecha_corte=AAAA-MM-DD.
+        """
+        fecha_corte = leer_fecha(request, 'fecha_corte', timezone.now().date())
+        
+        clientes = list(Deuda.objects.antiguedad_por_cliente(fecha_corte))
+        tramos = DeudaQuerySet.CAMPOS_ANTIGUEDAD
+        # Los totales salen de las filas ya agrupadas, sin otra consulta
+        totales = {tramo: sum((c[tramo] for c in clientes), Decimal('0.00')) for tramo in tramos}
+        
+        return Response({
+            'fecha_corte': fecha_corte,
+            'totales': totales,
+            'clientes': [
+                {'cliente': c['cliente_id'], 'nombre': c['cliente__nombre'], **{t: c[t] for t in tramos}}
+                for c in clientes
+            ],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def tendencia(self, request):
+        """
+        Evolución de la cartera desde las fotos diarias (registrar_saldo_diario):
+        ?desde= y ?hasta= (AAAA-MM-DD, por defecto los últimos 90 días o 12
+        meses), ?agrupar=dia|mes y ?cliente= para la serie de un cliente.
+        """
+        agrupar = request.query_params.get('agrupar', 'dia')
+        if agrupar not in SaldoDiarioService.AGRUPACIONES:
+            raise serializers.ValidationError({'agrupar': ['Use dia o mes.']})
+        
+        hasta = leer_fecha(request, 'hasta', timezone.localdate())
+        desde = leer_fecha(request, 'desde', hasta - timedelta(days=365 if agrupar == 'mes' else 90))
+        cliente = request.query_params.get('cliente') or None
+        if cliente is not None and not cliente.isdigit():
+            raise serializers.ValidationError({'cliente': ['Cliente inválido.']})
+        
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'agrupar': agrupar,
+            'cliente': int(cliente) if cliente else None,
+            'resultados': SaldoDiarioService.tendencia(desde, hasta, cliente, agrupar),
+        })
 
 class AbonoViewSet(viewsets.ModelViewSet):
     queryset = Abono.objects.all()
     serializer_class = AbonoSerializer
+    
+    def perform_create(self, serializer):
+        try:
+            serializer.instance = AbonoService.registrar_abono(Abono(**serializer.validated_data))
+        except AbonoInvalido as e:
+            raise serializers.ValidationError({'monto': [str(e)]})
+    
+    def perform_update(self, serializer):
+        abono = serializer.instance
+        for campo, valor in serializer.validated_data.items():
+            setattr(abono, campo, valor)
+        try:
+            serializer.instance = AbonoService.actualizar_abono(abono)
+        except AbonoInvalido as e:
+            raise serializers.ValidationError({'monto': [str(e)]})
 
 # =============================================================================
+# Criterios de orden permitidos en el listado: parámetro -> campo
+ORDEN_LISTADO = {
+    'fecha': 'fecha',
+    'cliente': 'cliente__nombre',
+    'monto': 'monto',
+    'saldo': 'saldo',
+    'vencimiento': 'fecha_vencimiento',
+}
+
+def filtrar_listado_deudas(parametros):
+    """Aplica los filtros y el orden del listado; devuelve (deudas, orden)"""
+    deudas = Deuda.objects.con_saldo().select_related('cliente')
+    
+    cliente = parametros.get('cliente', '').strip()
+    if cliente:
+        deudas = deudas.filter(
+            Q(cliente__nombre__icontains=cliente) | Q(cliente__correo__icontains=cliente)
+        )
+    
+    estado = parametros.get('estado')
+    if estado == 'pendiente':
+        deudas = deudas.filter(pagada=False)
+    elif estado == 'pagada':
+        deudas = deudas.filter(pagada=True)
+    elif estado == 'vencida':
+        deudas = deudas.vencidas()
+    
+    try:
+        if parametros.get('desde'):
+            deudas = deudas.filter(fecha__gte=datetime.strptime(parametros['desde'], '%Y-%m-%d').date())
+        if parametros.get('hasta'):
+            deudas = deudas.filter(fecha__lte=datetime.strptime(parametros['hasta'], '%Y-%m-%d').date())
+    except ValueError:
+        pass
+    
+    orden = parametros.get('orden', '-fecha')
+    campo = ORDEN_LISTADO.get(orden.lstrip('-'))
+    if campo is None:
+        orden, campo = '-fecha', 'fecha'
+    descendente = '-' if orden.startswith('-') else ''
+    
+    return deudas.order_by(f'{descendente}{campo}', f'{descendente}id'), orden
+
 def listado_deudas(request):
-    deudas = Deuda.objects.all()
+    deudas, orden = filtrar_listado_deudas(request.GET)
     
-    deudas_con_info = []
-    total_deudas = Decimal('0.00')
-    total_abonado_general = Decimal('0.00')
-    deudas_vencidas_count = 0
+    por_pagina = request.GET.get('por_pagina', '')
+    por_pagina = min(int(por_pagina), 100) if por_pagina.isdigit() and int(por_pagina) > 0 else 25
+    pagina = Paginator(deudas, por_pagina).get_page(request.GET.get('page'))
     
-    for deuda in deudas:
-        saldo_restante = deuda.calcular_saldo_restante()
-        total_abonado = deuda.monto - saldo_restante
-        esta_vencida = deuda.esta_vencida()
-        
-        if esta_vencida:
-            deudas_vencidas_count += 1
-        
-        total_deudas += deuda.monto
-        total_abonado_general += total_abonado
-        
-        deudas_con_info.append({
-            'deuda': deuda,
-            'saldo_restante': saldo_restante,
-            'total_abonado': total_abonado,
-            'esta_vencida': esta_vencida
-        })
+    # Parámetros actuales para armar los enlaces de orden y paginación
+    sin_pagina = request.GET.copy()
+    sin_pagina.pop('page', None)
+    sin_orden = sin_pagina.copy()
+    sin_orden.pop('orden', None)
+    
+    # Los totales del encabezado son de toda la cartera y salen de la caché
+    estadisticas = estadisticas_en_cache()
     
     context = {
-        'deudas_con_info': deudas_con_info,
-        'total_deudas': total_deudas,
-        'total_abonado_general': total_abonado_general,
-        'saldo_pendiente_total': total_deudas - total_abonado_general,
-        'deudas_vencidas_count': deudas_vencidas_count,
+        'pagina': pagina,
+        'deudas': pagina.object_list,
+        'filtros': {
+            clave: request.GET[clave]
+            for clave in ('cliente', 'estado', 'desde', 'hasta') if request.GET.get(clave)
+        },
+        'orden': orden,
+        'parametros_pagina': sin_pagina.urlencode(),
+        'parametros_orden': sin_orden.urlencode(),
+        'total_deudas': estadisticas['total_deudas'],
+        'total_abonado_general': estadisticas['total_abonado'],
+        'saldo_pendiente_total': estadisticas['saldo_pendiente'],
+        'deudas_vencidas_count': estadisticas['deudas_vencidas'],
     }
     
     return render(request, 'listado.html', context)
 
+def detalle_abono_deuda(request, deuda_id):
+    """Contenido del modal de abono, cargado bajo demanda desde el listado"""
+    deuda = get_object_or_404(Deuda.objects.con_saldo().select_related('cliente'), id=deuda_id)
+    
+    return render(request, 'cartera/modal_abono.html', {
+        'deuda': deuda,
+        'volver': request.GET.get('volver', ''),
+    })
+
+def volver_al_listado(request):
+    """Redirige al listado conservando filtros y página, si vienen en 'volver'"""
+    volver = request.POST.get('volver', '')
+    if volver and url_has_allowed_host_and_scheme(volver, allowed_hosts={request.get_host()}):
+        return redirect(volver)
+    return redirect('listado_deudas')
+
 def marcar_como_pagada(request, deuda_id):
     deuda = get_object_or_404(Deuda, id=deuda_id)
     
@@ -80,72 +324,72 @@ def marcar_como_pagada(request, deuda_id):
         deuda.save()
         messages.success(request, f'Deuda de {deuda.cliente.nombre} marcada como pagada.')
     
-    return redirect('listado_deudas')
+    return volver_al_listado(request)
 
 def agregar_abono(request, deuda_id):
     deuda = get_object_or_404(Deuda, id=deuda_id)
     
     if request.method == 'POST':
-        monto_abono = request.POST.get('monto')
-        descripcion = request.POST.get('descripcion', 'Abono realizado')
-        
         try:
-            monto_abono = Decimal(monto_abono)
-            saldo_restante = deuda.calcular_saldo_restante()
-            
-            if monto_abono <= 0:
-                messages.error(request, 'El monto del abono debe ser mayor a cero.')
-            elif monto_abono > saldo_restante:
-                messages.error(request, f'El abono no puede ser mayor al saldo restante (${saldo_restante}).')
-            else:
-                Abono.objects.create(
-                    deuda=deuda,
-                    monto=monto_abono,
-                    descripcion=descripcion
-                )
-                messages.success(request, f'Abono de ${monto_abono} registrado correctamente.')
-                
-        except (ValueError, TypeError):
-            messages.error(request, 'Monto inválido. Ingrese un número válido.')
+            abono = AbonoService.registrar_abono(Abono(
+                deuda=deuda,
+                monto=request.POST.get('monto'),
+                descripcion=request.POST.get('descripcion', 'Abono realizado')
+            ))
+            messages.success(request, f'Abono de ${abono.monto} registrado correctamente.')
+        except AbonoInvalido as e:
+            messages.error(request, str(e))
     
-    return redirect('listado_deudas')
+    return volver_al_listado(request)
 
 
 def deudas_con_saldo(request):
-    deudas = Deuda.objects.all()
+    deudas = Deuda.objects.con_saldo().select_related('cliente')
     resultado = []
     
     for deuda in deudas:
-        saldo_restante = deuda.calcular_saldo_restante()
         resultado.append({
             'id': deuda.id,
             'cliente': deuda.cliente.nombre,
             'monto_total': deuda.monto,
-            'saldo_restante': saldo_restante,
+            'saldo_restante': deuda.saldo_restante,
             'pagada': deuda.pagada,
-            'vencida': deuda.esta_vencida()
+            'vencida': deuda.esta_vencida
         })
     
     return JsonResponse(resultado, safe=False)
 
-def estadisticas_cartera(request):
-    total_deudas = Deuda.objects.aggregate(total=Sum('monto'))['total'] or Decimal('0.00')
-    total_abonado = Abono.objects.aggregate(total=Sum('monto'))['total'] or Decimal('0.00')
-    
-    deudas_vencidas = 0
-    for deuda in Deuda.objects.all():
-        if deuda.esta_vencida():
-            deudas_vencidas += 1
+def calcular_estadisticas_cartera(hoy=None):
+    totales = Deuda.objects.aggregate(
+        total_deudas=Sum('monto'),
+        total_abonado=Sum('total_abonado'),
+        deudas_vencidas=Count('id', filter=Deuda.objects.filtro_vencidas(hoy))
+    )
+    total_deudas = totales['total_deudas'] or Decimal('0.00')
+    total_abonado = totales['total_abonado'] or Decimal('0.00')
     
     estadisticas = {
         'total_deudas': total_deudas,
         'total_abonado': total_abonado,
         'saldo_pendiente': total_deudas - total_abonado,
-        'deudas_vencidas': deudas_vencidas,
+        'deudas_vencidas': totales['deudas_vencidas'],
         'total_clientes': Cliente.objects.count()
     }
     
-    return JsonResponse(estadisticas)
+    return estadisticas
+
+def estadisticas_en_cache():
+    # La versión cambia con cada escritura en la cartera (ver signals.py),
+    # así que una clave vieja nunca se vuelve a leer. El día también forma
+    # parte de la clave: las deudas vencidas cambian al pasar la medianoche
+    hoy = timezone.localdate()
+    clave = f'cartera:estadisticas:{hoy.isoformat()}:v{VersionCartera.actual()}'
+    return cache.get_or_set(
+        clave, lambda: calcular_estadisticas_cartera(hoy), settings.CARTERA_ESTADISTICAS_TTL
+    )
+
+def estadisticas_cartera(request):
+    return JsonResponse(estadisticas_en_cache())
 
 
 def crear_deuda_view(request):
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='notif_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['deuda', 'tipo', 'fecha_creacion'], name='notif_deuda_tipo_fecha_idx'),
+        ),
+    ]
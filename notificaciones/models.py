@@ -33,6 +33,10 @@ class Notificacion(models.Model):
         ordering = ['-fecha_creacion']
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='notif_estado_fecha_idx'),
+            models.Index(fields=['deuda', 'tipo', 'fecha_creacion'], name='notif_deuda_tipo_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tipo} - {self.destinatario_email} - {self.estado}"
\ No newline at end of file
@@ -1,3 +1,25 @@
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from almacen_refrigas.pruebas import PlanConsultaMixin
+
+from .models import Notificacion
+
+
+class PlanesDeConsultaTests(PlanConsultaMixin, TestCase):
+
+    def test_notificaciones_por_estado(self):
+        self.assertUsaIndice(
+            Notificacion.objects.filter(estado='ENVIADA').order_by('fecha_creacion'),
+            'notif_estado_fecha_idx'
+        )
+
+    def test_notificaciones_recientes_de_una_deuda(self):
+        self.assertUsaIndice(
+            Notificacion.objects.filter(
+                deuda_id=1,
+                tipo='DEUDA_VENCIDA_CLIENTE',
+                fecha_creacion__gte=timezone.now()
+            ),
+            'notif_deuda_tipo_fecha_idx'
+        )
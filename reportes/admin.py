@@ -1,3 +1,16 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import TrabajoReporte
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'progreso', 'usuario', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('tipo', 'estado')
+    readonly_fields = ('clave', 'filtros', 'progreso', 'archivo', 'error_mensaje', 'fecha_fin')
+
+    def delete_queryset(self, request, queryset):
+        # Borrar uno a uno para eliminar también los archivos generados
+        for trabajo in queryset:
+            trabajo.delete()
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from reportes.models import TrabajoReporte
+from reportes.services import ReporteService
+
+class Command(BaseCommand):
+    help = 'Worker de reportes: genera los trabajos pendientes en segundo plano'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesar los pendientes y terminar'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2,
+            help='Segundos entre revisiones de la cola'
+        )
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            help='Eliminar trabajos (y sus archivos) con más de N días'
+        )
+
+    def handle(self, *args, **options):
+        if options['purgar_dias'] is not None:
+            limite = timezone.now() - timedelta(days=options['purgar_dias'])
+            antiguos = TrabajoReporte.objects.filter(fecha_creacion__lt=limite)
+            total = 0
+            for trabajo in antiguos:
+                trabajo.delete()
+                total += 1
+            self.stdout.write(self.style.SUCCESS(f'✅ Trabajos eliminados: {total}'))
+
+        self.stdout.write(self.style.WARNING('Procesando trabajos de reportes...'))
+
+        while True:
+            procesados = ReporteService.procesar_pendientes()
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(f'✅ Reportes generados: {procesados}'))
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
+            # Como al final de una petición: descartar conexiones caídas o vencidas
+            close_old_connections()
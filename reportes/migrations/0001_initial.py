@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import reportes.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('GENERAL', 'Reporte General'), ('CLIENTES', 'Reporte de Clientes'), ('ABONOS', 'Reporte de Abonos')], max_length=20)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('clave', models.CharField(db_index=True, max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=12)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, storage=reportes.models.almacenamiento_reportes, upload_to='')),
+                ('error_mensaje', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
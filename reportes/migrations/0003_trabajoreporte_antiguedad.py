@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_trabajoreporte_caja'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='tipo',
+            field=models.CharField(choices=[('GENERAL', 'Reporte General'), ('CLIENTES', 'Reporte de Clientes'), ('ABONOS', 'Reporte de Abonos'), ('CAJA', 'Reporte de Caja'), ('ANTIGUEDAD', 'Antigüedad de Cartera')], max_length=20),
+        ),
+    ]
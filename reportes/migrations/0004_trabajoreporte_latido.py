@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_trabajoreporte_antiguedad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,68 @@
 from django.db import models
 
 # Create your models here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+import os
+
+
+class AlmacenamientoReportes(FileSystemStorage):
+    """Guarda en settings.REPORTES_DIR, leído en cada uso y no al importar"""
+
+    @property
+    def base_location(self):
+        return settings.REPORTES_DIR
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def almacenamiento_reportes():
+    """Carpeta donde quedan los reportes generados en segundo plano"""
+    return AlmacenamientoReportes()
+
+
+class TrabajoReporte(models.Model):
+    TIPO_CHOICES = [
+        ('GENERAL', 'Reporte General'),
+        ('CLIENTES', 'Reporte de Clientes'),
+        ('ABONOS', 'Reporte de Abonos'),
+        ('CAJA', 'Reporte de Caja'),
+        ('ANTIGUEDAD', 'Antigüedad de Cartera'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    filtros = models.JSONField(default=dict, blank=True)
+    # Hash de (tipo, filtros, versión de la cartera): identifica el resultado
+    clave = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='PENDIENTE')
+    progreso = models.PositiveSmallIntegerField(default=0)
+    archivo = models.FileField(storage=almacenamiento_reportes, upload_to='', blank=True)
+    error_mensaje = models.TextField(blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    # Última señal de vida del proceso que lo genera (al tomarlo y con cada avance)
+    latido = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.estado} ({self.progreso}%)"
+
+    def delete(self, *args, **kwargs):
+        if self.archivo:
+            self.archivo.delete(save=False)
+        return super().delete(*args, **kwargs)
@@ -1,17 +1,135 @@
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, Value, DecimalField, Window, OuterRef, Subquery
+from django.db.models.functions import Coalesce, FirstValue
 from django.utils import timezone
-from cartera.models import Cliente, Deuda, Abono
-from io import BytesIO
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from cartera.models import Cliente, ClienteResumen, Deuda, DeudaQuerySet, Abono, VersionCartera
+from caja.models import Transaccion, CierreCaja, TipoTransaccion, VersionCaja
+from caja.services import CajaService
+from .models import TrabajoReporte
+from datetime import date, timedelta
 from decimal import Decimal
+import csv
+import hashlib
+import json
+import pickle
+import tempfile
+import threading
+
+
+class _HojaTemporal:
+    """Filas de una hoja guardadas en disco mientras se mide cada columna"""
+
+    def __init__(self, titulo, encabezados):
+        self.titulo = titulo
+        self.encabezados = list(encabezados)
+        self.anchos = [len(str(h)) for h in self.encabezados]
+        self.filas = tempfile.TemporaryFile()
+
+    def escribir(self, valores, negrita):
+        for i, valor in enumerate(valores):
+            largo = len(str(valor)) if valor is not None else 0
+            if i >= len(self.anchos):
+                self.anchos.append(largo)
+            elif largo > self.anchos[i]:
+                self.anchos[i] = largo
+        pickle.dump((valores, negrita), self.filas, pickle.HIGHEST_PROTOCOL)
+
+    def leer(self):
+        self.filas.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.filas)
+            except EOFError:
+                self.filas.close()
+                return
+
+
+class LibroExcelStreaming:
+    """
+    Libro de Excel generado en modo write-only.
+
+    openpyxl escribe los anchos de columna antes que las filas, así que las
+    filas se van guardando en un archivo temporal mientras se calcula el
+    ancho de cada columna; al final se vuelcan al libro ya con los anchos.
+    La memoria usada no depende de la cantidad de filas.
+    """
+
+    ANCHO_MAXIMO = 50
+    # Cada cuántas filas se informa el avance
+    INTERVALO_PROGRESO = 1000
+
+    def __init__(self, titulo, encabezados, progreso=None, total=None):
+        """progreso(filas_escritas, total) se llama cada INTERVALO_PROGRESO filas"""
+        self.progreso = progreso
+        self.total = total
+        self.escritas = 0
+        self.hojas = []
+        self.nueva_hoja(titulo, encabezados)
+
+    def nueva_hoja(self, titulo, encabezados):
+        """Las filas siguientes se agregan a una hoja nueva"""
+        self._hoja = _HojaTemporal(titulo, encabezados)
+        self.hojas.append(self._hoja)
+
+    def agregar_fila(self, valores, negrita=False):
+        self._hoja.escribir(list(valores), negrita)
+        self.escritas += 1
+        if self.progreso and self.escritas % self.INTERVALO_PROGRESO == 0:
+            self.progreso(self.escritas, self.total)
+
+    def agregar_totales(self, etiqueta, valores):
+        """Agrega una fila vacía y la fila de totales ({columna: valor}, base 1)"""
+        fila = [etiqueta] + [None] * (max(valores) - 1)
+        for columna, valor in valores.items():
+            fila[columna - 1] = valor
+        self.agregar_fila([])
+        self.agregar_fila(fila, negrita=True)
+
+    def guardar(self):
+        """Escribe el libro en un archivo temporal y lo devuelve posicionado al inicio"""
+        wb = Workbook(write_only=True)
+        negrita = Font(bold=True)
+
+        for hoja in self.hojas:
+            ws = wb.create_sheet(hoja.titulo)
+
+            for i, ancho in enumerate(hoja.anchos, start=1):
+                ws.column_dimensions[get_column_letter(i)].width = min(ancho + 2, self.ANCHO_MAXIMO)
+
+            ws.append(ReporteService.aplicar_estilos_encabezado(ws, hoja.encabezados))
+
+            for valores, es_negrita in hoja.leer():
+                if es_negrita and valores:
+                    etiqueta = WriteOnlyCell(ws, value=valores[0])
+                    etiqueta.font = negrita
+                    valores = [etiqueta] + valores[1:]
+                ws.append(valores)
+
+        archivo = tempfile.TemporaryFile()
+        wb.save(archivo)
+        archivo.seek(0)
+
+        return archivo
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla"""
+
+    def write(self, valor):
+        return valor
+
 
 class ReporteService:
     
     @staticmethod
-    def aplicar_estilos_encabezado(worksheet, ultima_columna):
-        """Aplica estilos al encabezado del reporte"""
+    def aplicar_estilos_encabezado(worksheet, encabezados):
+        """Devuelve las celdas del encabezado con sus estilos (hoja write-only)"""
         header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
         header_font = Font(bold=True, color="FFFFFF", size=11)
         border = Border(
@@ -21,47 +139,64 @@ class ReporteService:
             bottom=Side(style='thin')
         )
         
-        for col in range(1, ultima_columna + 1):
-            cell = worksheet.cell(row=1, column=col)
+        celdas = []
+        for encabezado in encabezados:
+            cell = WriteOnlyCell(worksheet, value=encabezado)
             cell.fill = header_fill
             cell.font = header_font
             cell.alignment = Alignment(horizontal='center', vertical='center')
             cell.border = border
+            celdas.append(cell)
+        
+        return celdas
     
-    @staticmethod
-    def ajustar_anchos_columna(worksheet):
-        """Ajusta automáticamente el ancho de las columnas"""
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+    # Columnas de cada reporte: (clave para JSONL, encabezado)
+    COLUMNAS_GENERAL = [
+        ('id_deuda', 'ID Deuda'), ('cliente', 'Cliente'), ('correo_cliente', 'Correo Cliente'),
+        ('telefono', 'Teléfono'), ('descripcion', 'Descripción'), ('monto_total', 'Monto Total'),
+        ('total_abonado', 'Total Abonado'), ('saldo_restante', 'Saldo Restante'), ('estado', 'Estado'),
+        ('fecha_creacion', 'Fecha Creación'), ('fecha_vencimiento', 'Fecha Vencimiento'),
+        ('dias_vencidos', 'Días Vencidos'),
+    ]
+    
+    COLUMNAS_CLIENTES = [
+        ('id_cliente', 'ID Cliente'), ('nombre', 'Nombre'), ('correo', 'Correo'), ('telefono', 'Teléfono'),
+        ('total_deudas', 'Total Deudas'), ('deudas_activas', 'Deudas Activas'),
+        ('monto_total_adeudado', 'Monto Total Adeudado'), ('monto_total_pagado', 'Monto Total Pagado'),
+        ('saldo_pendiente', 'Saldo Pendiente'), ('vencimiento_mas_antiguo', 'Vencimiento Más Antiguo'),
+    ]
+    
+    COLUMNAS_ABONOS = [
+        ('id_abono', 'ID Abono'), ('cliente', 'Cliente'), ('descripcion_deuda', 'Descripción Deuda'),
+        ('monto_abono', 'Monto Abono'), ('fecha_abono', 'Fecha Abono'),
+        ('saldo_tras_abono', 'Saldo Deuda Tras Abono'), ('estado_deuda', 'Estado Deuda'),
+    ]
+    
+    COLUMNAS_CAJA_DIARIO = [
+        ('fecha', 'Fecha'), ('ventas_facturadas', 'Ventas Facturadas'),
+        ('ventas_no_facturadas', 'Ventas No Facturadas'), ('otros_ingresos', 'Otros Ingresos'),
+        ('total', 'Total'), ('transacciones', 'Transacciones'), ('cierre', 'Cierre'),
+        ('total_fisico', 'Total Físico'), ('diferencia', 'Diferencia'),
+    ]
+    
+    COLUMNAS_CAJA = [
+        ('id_transaccion', 'ID Transacción'), ('fecha', 'Fecha'), ('tipo', 'Tipo'),
+        ('monto', 'Monto'), ('descripcion', 'Descripción'), ('numero_factura', 'Número Factura'),
+        ('usuario', 'Usuario'),
+    ]
+    
+    COLUMNAS_ANTIGUEDAD = [
+        ('id_cliente', 'ID Cliente'), ('cliente', 'Cliente'), ('por_vencer', 'Por Vencer'),
+        ('de_1_a_30', '1-30 Días'), ('de_31_a_60', '31-60 Días'), ('de_61_a_90', '61-90 Días'),
+        ('mas_de_90', 'Más de 90 Días'), ('saldo_total', 'Saldo Total'),
+    ]
+    
+    TAMANO_LOTE = 2000
     
     @staticmethod
-    def generar_reporte_general(fecha_inicio=None, fecha_fin=None, cliente_id=None, incluir_pagadas=False):
-        """Genera un reporte general de deudas con filtros"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte General"
-        
-        # Encabezados
-        headers = [
-            'ID Deuda', 'Cliente', 'Correo Cliente', 'Teléfono', 'Descripción',
-            'Monto Total', 'Total Abonado', 'Saldo Restante', 'Estado',
-            'Fecha Creación', 'Fecha Vencimiento', 'Días Vencidos'
-        ]
-        ws.append(headers)
-        
-        # Filtrar deudas
-        deudas = Deuda.objects.select_related('cliente').all()
+    def consulta_reporte_general(fecha_inicio=None, fecha_fin=None, cliente_id=None, incluir_pagadas=False):
+        """Deudas filtradas, anotadas con saldo y vencimiento"""
+        deudas = Deuda.objects.con_saldo()
         
         if fecha_inicio:
             deudas = deudas.filter(fecha__gte=fecha_inicio)
@@ -72,145 +207,504 @@ class ReporteService:
         if not incluir_pagadas:
             deudas = deudas.filter(pagada=False)
         
-        # Datos
-        for deuda in deudas:
-            saldo_restante = deuda.calcular_saldo_restante()
-            total_abonado = deuda.monto - saldo_restante
-            
-            dias_vencidos = ''
-            if deuda.fecha_vencimiento and deuda.esta_vencida():
-                dias_vencidos = (timezone.now().date() - deuda.fecha_vencimiento).days
-            
-            estado = 'Pagada' if deuda.pagada else ('Vencida' if deuda.esta_vencida() else 'Pendiente')
+        return deudas
+    
+    @staticmethod
+    def filas_reporte_general(deudas):
+        """Filas del reporte general: una sola consulta anotada, leída por partes"""
+        filas = deudas.order_by('id').values(
+            'id', 'cliente__nombre', 'cliente__correo', 'cliente__telefono',
+            'descripcion', 'monto', 'total_abonado', 'saldo_restante', 'pagada',
+            'esta_vencida', 'fecha', 'fecha_vencimiento', 'dias_vencidos'
+        )
+        
+        for deuda in filas.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            if deuda['pagada']:
+                estado = 'Pagada'
+            else:
+                estado = 'Vencida' if deuda['esta_vencida'] else 'Pendiente'
             
-            ws.append([
-                deuda.id,
-                deuda.cliente.nombre,
-                deuda.cliente.correo,
-                deuda.cliente.telefono or 'N/A',
-                deuda.descripcion,
-                float(deuda.monto),
-                float(total_abonado),
-                float(saldo_restante),
+            yield [
+                deuda['id'],
+                deuda['cliente__nombre'],
+                deuda['cliente__correo'],
+                deuda['cliente__telefono'] or 'N/A',
+                deuda['descripcion'],
+                deuda['monto'],
+                deuda['total_abonado'],
+                deuda['saldo_restante'],
                 estado,
-                deuda.fecha.strftime('%Y-%m-%d'),
-                deuda.fecha_vencimiento.strftime('%Y-%m-%d') if deuda.fecha_vencimiento else 'N/A',
-                dias_vencidos
-            ])
+                deuda['fecha'].strftime('%Y-%m-%d'),
+                deuda['fecha_vencimiento'].strftime('%Y-%m-%d') if deuda['fecha_vencimiento'] else 'N/A',
+                deuda['dias_vencidos'] if deuda['dias_vencidos'] is not None else ''
+            ]
+    
+    @staticmethod
+    def generar_reporte_general(fecha_inicio=None, fecha_fin=None, cliente_id=None, incluir_pagadas=False, progreso=None):
+        """Genera un reporte general de deudas con filtros"""
+        headers = [encabezado for _, encabezado in ReporteService.COLUMNAS_GENERAL]
+        libro = LibroExcelStreaming("Reporte General", headers, progreso)
         
-        # Totales
-        ws.append([])
-        totales_row = ws.max_row + 1
-        ws.cell(row=totales_row, column=1, value='TOTALES')
-        ws.cell(row=totales_row, column=1).font = Font(bold=True)
+        deudas = ReporteService.consulta_reporte_general(
+            fecha_inicio, fecha_fin, cliente_id, incluir_pagadas
+        )
         
-        total_monto = sum(float(d.monto) for d in deudas)
-        total_saldo = sum(float(d.calcular_saldo_restante()) for d in deudas)
-        total_abonado_general = total_monto - total_saldo
+        if progreso:
+            libro.total = deudas.count()
         
-        ws.cell(row=totales_row, column=6, value=total_monto)
-        ws.cell(row=totales_row, column=7, value=total_abonado_general)
-        ws.cell(row=totales_row, column=8, value=total_saldo)
+        for fila in ReporteService.filas_reporte_general(deudas):
+            libro.agregar_fila(fila)
         
-        # Estilos
-        ReporteService.aplicar_estilos_encabezado(ws, len(headers))
-        ReporteService.ajustar_anchos_columna(ws)
+        # Totales calculados en la base de datos
+        totales = deudas.aggregate(
+            total_monto=Sum('monto'),
+            total_abonado=Sum('total_abonado'),
+            total_saldo=Sum('saldo')
+        )
         
-        # Guardar en memoria
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        libro.agregar_totales('TOTALES', {
+            6: float(totales['total_monto'] or 0),
+            7: float(totales['total_abonado'] or 0),
+            8: float(totales['total_saldo'] or 0),
+        })
         
-        return buffer
+        return libro.guardar()
     
     @staticmethod
-    def generar_reporte_clientes():
+    def filas_reporte_clientes():
+        """
+        Filas del reporte de clientes: lee los totales de ClienteResumen en
+        una sola consulta, sin agrupar las deudas
+        """
+        clientes = Cliente.objects.order_by('id').values(
+            'id', 'nombre', 'correo', 'telefono',
+            *(f'resumen__{campo}' for campo in ClienteResumen.CAMPOS)
+        )
+        cero = Decimal('0.00')
+        
+        for cliente in clientes.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            # Clientes creados en bloque pueden no tener resumen todavía
+            vencimiento = cliente['resumen__vencimiento_mas_antiguo']
+            yield [
+                cliente['id'],
+                cliente['nombre'],
+                cliente['correo'],
+                cliente['telefono'] or 'N/A',
+                cliente['resumen__total_deudas'] or 0,
+                cliente['resumen__deudas_activas'] or 0,
+                cliente['resumen__monto_total'] or cero,
+                cliente['resumen__monto_pagado'] or cero,
+                cliente['resumen__saldo_pendiente'] or cero,
+                vencimiento.strftime('%Y-%m-%d') if vencimiento else 'N/A',
+            ]
+    
+    @staticmethod
+    def generar_reporte_clientes(progreso=None):
         """Genera un reporte detallado de todos los clientes"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte Clientes"
-        
-        headers = [
-            'ID Cliente', 'Nombre', 'Correo', 'Teléfono',
-            'Total Deudas', 'Deudas Activas', 'Monto Total Adeudado',
-            'Monto Total Pagado', 'Saldo Pendiente'
-        ]
-        ws.append(headers)
-        
-        clientes = Cliente.objects.all()
-        
-        for cliente in clientes:
-            deudas = cliente.deuda_set.all()
-            deudas_activas = deudas.filter(pagada=False)
-            
-            monto_total = sum(d.monto for d in deudas)
-            saldo_pendiente = sum(d.calcular_saldo_restante() for d in deudas_activas)
-            monto_pagado = monto_total - saldo_pendiente
-            
-            ws.append([
-                cliente.id,
-                cliente.nombre,
-                cliente.correo,
-                cliente.telefono or 'N/A',
-                deudas.count(),
-                deudas_activas.count(),
-                float(monto_total),
-                float(monto_pagado),
-                float(saldo_pendiente)
-            ])
+        headers = [encabezado for _, encabezado in ReporteService.COLUMNAS_CLIENTES]
+        libro = LibroExcelStreaming("Reporte Clientes", headers, progreso)
         
-        ReporteService.aplicar_estilos_encabezado(ws, len(headers))
-        ReporteService.ajustar_anchos_columna(ws)
+        if progreso:
+            libro.total = Cliente.objects.count()
         
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        for fila in ReporteService.filas_reporte_clientes():
+            libro.agregar_fila(fila)
         
-        return buffer
+        return libro.guardar()
     
     @staticmethod
-    def generar_reporte_abonos(fecha_inicio=None, fecha_fin=None):
-        """Genera un reporte de todos los abonos realizados"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte Abonos"
+    def consulta_reporte_abonos(fecha_inicio=None, fecha_fin=None):
+        """
+        Devuelve (abonos, filas): los abonos filtrados y la consulta de filas
+        con el saldo de la deuda después de cada abono.
+        """
+        abonos = Abono.objects.all()
         
-        headers = [
-            'ID Abono', 'Cliente', 'Descripción Deuda', 'Monto Abono',
-            'Fecha Abono', 'Saldo Restante Deuda', 'Estado Deuda'
-        ]
-        ws.append(headers)
+        # Los abonos posteriores a fecha_fin no afectan el saldo acumulado
+        if fecha_fin:
+            abonos = abonos.filter(fecha__lte=fecha_fin)
         
-        abonos = Abono.objects.select_related('deuda__cliente').all()
+        # Saldo de la deuda justo después de cada abono:
+        # monto - SUM(monto) OVER (PARTITION BY deuda ORDER BY fecha, id)
+        filas = abonos.annotate(
+            saldo_tras_abono=F('deuda__monto') - Window(
+                expression=Sum('monto'),
+                partition_by=[F('deuda_id')],
+                order_by=[F('fecha').asc(), F('id').asc()]
+            ),
+            # fecha_inicio se aplica sobre la ventana (QUALIFY) para que los
+            # abonos anteriores sigan descontando del saldo acumulado
+            fecha_abono=Window(
+                expression=FirstValue('fecha'),
+                partition_by=[F('id')]
+            ),
+        )
         
         if fecha_inicio:
             abonos = abonos.filter(fecha__gte=fecha_inicio)
-        if fecha_fin:
-            abonos = abonos.filter(fecha__lte=fecha_fin)
+            filas = filas.filter(fecha_abono__gte=fecha_inicio)
+        
+        filas = filas.order_by('fecha', 'id').values(
+            'id', 'deuda__cliente__nombre', 'deuda__descripcion', 'monto',
+            'fecha', 'saldo_tras_abono', 'deuda__pagada'
+        )
+        
+        return abonos, filas
+    
+    @staticmethod
+    def filas_reporte_abonos(filas):
+        for abono in filas.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            yield [
+                abono['id'],
+                abono['deuda__cliente__nombre'],
+                abono['deuda__descripcion'],
+                abono['monto'],
+                abono['fecha'].strftime('%Y-%m-%d'),
+                abono['saldo_tras_abono'],
+                'Pagada' if abono['deuda__pagada'] else 'Pendiente'
+            ]
+    
+    @staticmethod
+    def generar_reporte_abonos(fecha_inicio=None, fecha_fin=None, progreso=None):
+        """Genera un reporte de todos los abonos realizados"""
+        headers = [encabezado for _, encabezado in ReporteService.COLUMNAS_ABONOS]
+        libro = LibroExcelStreaming("Reporte Abonos", headers, progreso)
         
-        for abono in abonos:
-            ws.append([
-                abono.id,
-                abono.deuda.cliente.nombre,
-                abono.deuda.descripcion,
-                float(abono.monto),
-                abono.fecha.strftime('%Y-%m-%d'),
-                float(abono.deuda.calcular_saldo_restante()),
-                'Pagada' if abono.deuda.pagada else 'Pendiente'
-            ])
+        abonos, filas = ReporteService.consulta_reporte_abonos(fecha_inicio, fecha_fin)
+        
+        if progreso:
+            libro.total = abonos.count()
+        
+        for fila in ReporteService.filas_reporte_abonos(filas):
+            libro.agregar_fila(fila)
         
         # Total de abonos
-        ws.append([])
-        totales_row = ws.max_row + 1
-        ws.cell(row=totales_row, column=1, value='TOTAL ABONOS')
-        ws.cell(row=totales_row, column=1).font = Font(bold=True)
-        ws.cell(row=totales_row, column=4, value=float(sum(a.monto for a in abonos)))
+        total = abonos.aggregate(total=Sum('monto'))['total']
+        libro.agregar_totales('TOTAL ABONOS', {
+            4: float(total or 0),
+        })
         
-        ReporteService.aplicar_estilos_encabezado(ws, len(headers))
-        ReporteService.ajustar_anchos_columna(ws)
+        return libro.guardar()
+    
+    @staticmethod
+    def consulta_reporte_caja(fecha_inicio=None, fecha_fin=None, usuario_id=None):
+        transacciones = Transaccion.objects.order_by()
+        
+        if fecha_inicio:
+            transacciones = transacciones.filter(fecha__gte=fecha_inicio)
+        if fecha_fin:
+            transacciones = transacciones.filter(fecha__lte=fecha_fin)
+        if usuario_id:
+            transacciones = transacciones.filter(usuario_id=usuario_id)
+        
+        return transacciones
+    
+    @staticmethod
+    def _sumas_por_tipo():
+        cero = Value(Decimal('0.00'), output_field=DecimalField())
+        return {
+            campo: Coalesce(Sum('monto', filter=Q(tipo=tipo)), cero)
+            for tipo, campo in CajaService.CAMPOS_POR_TIPO.items()
+        }
+    
+    @staticmethod
+    def filas_resumen_caja(transacciones):
+        """Subtotales por día y tipo en una consulta agrupada, con los datos del cierre"""
+        cierre = CierreCaja.objects.filter(fecha=OuterRef('fecha'))
+        
+        dias = transacciones.values('fecha').annotate(
+            **ReporteService._sumas_por_tipo(),
+            total=Sum('monto'),
+            cantidad=Count('id'),
+            cerrado=Subquery(cierre.values('cerrado')[:1]),
+            total_fisico=Subquery(cierre.values('total_fisico')[:1]),
+            diferencia=Subquery(cierre.values('diferencia')[:1]),
+        ).order_by('fecha')
+        
+        for dia in dias.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            if dia['cerrado'] is None:
+                cierre_estado = 'Sin cierre'
+            else:
+                cierre_estado = 'Cerrada' if dia['cerrado'] else 'Abierta'
+            
+            yield [
+                dia['fecha'].strftime('%Y-%m-%d'),
+                dia['ventas_facturadas'],
+                dia['ventas_no_facturadas'],
+                dia['otros_ingresos'],
+                dia['total'],
+                dia['cantidad'],
+                cierre_estado,
+                dia['total_fisico'],
+                dia['diferencia'],
+            ]
+    
+    @staticmethod
+    def filas_reporte_caja(transacciones):
+        """Transacciones una por una, en orden cronológico"""
+        tipos = dict(TipoTransaccion.choices)
+        filas = transacciones.order_by('fecha', 'id').values(
+            'id', 'fecha', 'tipo', 'monto', 'descripcion', 'numero_factura', 'usuario__username'
+        )
+        
+        for transaccion in filas.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            yield [
+                transaccion['id'],
+                transaccion['fecha'].strftime('%Y-%m-%d'),
+                tipos.get(transaccion['tipo'], transaccion['tipo']),
+                transaccion['monto'],
+                transaccion['descripcion'],
+                transaccion['numero_factura'] or '',
+                transaccion['usuario__username'],
+            ]
+    
+    @staticmethod
+    def generar_reporte_caja(fecha_inicio=None, fecha_fin=None, usuario_id=None, progreso=None):
+        """Reporte de caja: resumen diario por tipo y, en otra hoja, las transacciones"""
+        headers = [encabezado for _, encabezado in ReporteService.COLUMNAS_CAJA_DIARIO]
+        libro = LibroExcelStreaming("Resumen Diario", headers, progreso)
+        
+        transacciones = ReporteService.consulta_reporte_caja(fecha_inicio, fecha_fin, usuario_id)
+        
+        if progreso:
+            libro.total = transacciones.count()
+        
+        for fila in ReporteService.filas_resumen_caja(transacciones):
+            libro.agregar_fila(fila)
+        
+        totales = transacciones.aggregate(
+            **ReporteService._sumas_por_tipo(),
+            total=Sum('monto'),
+            cantidad=Count('id')
+        )
+        libro.agregar_totales('TOTALES', {
+            2: float(totales['ventas_facturadas']),
+            3: float(totales['ventas_no_facturadas']),
+            4: float(totales['otros_ingresos']),
+            5: float(totales['total'] or 0),
+            6: totales['cantidad'],
+        })
+        
+        libro.nueva_hoja("Transacciones", [encabezado for _, encabezado in ReporteService.COLUMNAS_CAJA])
+        for fila in ReporteService.filas_reporte_caja(transacciones):
+            libro.agregar_fila(fila)
+        
+        return libro.guardar()
+    
+    @staticmethod
+    def filas_reporte_antiguedad(fecha_corte=None):
+        """Filas del reporte de antigüedad: una sola consulta agrupada por cliente"""
+        clientes = Deuda.objects.antiguedad_por_cliente(fecha_corte)
+        
+        for cliente in clientes.iterator(chunk_size=ReporteService.TAMANO_LOTE):
+            yield [cliente['cliente_id'], cliente['cliente__nombre']] + [
+                cliente[campo] for campo in DeudaQuerySet.CAMPOS_ANTIGUEDAD
+            ]
+    
+    @staticmethod
+    def generar_reporte_antiguedad(fecha_corte=None, progreso=None):
+        """Antigüedad de la cartera: saldo pendiente por cliente y tramo de días vencidos"""
+        headers = [encabezado for _, encabezado in ReporteService.COLUMNAS_ANTIGUEDAD]
+        libro = LibroExcelStreaming("Antigüedad de Cartera", headers, progreso)
+        
+        # Los totales se acumulan al escribir las filas, sin otra consulta
+        totales = [Decimal('0.00')] * len(DeudaQuerySet.CAMPOS_ANTIGUEDAD)
+        for fila in ReporteService.filas_reporte_antiguedad(fecha_corte):
+            libro.agregar_fila(fila)
+            totales = [total + valor for total, valor in zip(totales, fila[2:])]
+        
+        libro.agregar_totales('TOTALES', {
+            columna: float(total) for columna, total in enumerate(totales, start=3)
+        })
+        
+        return libro.guardar()
+    
+    # Exportación CSV / JSON Lines
+    
+    @staticmethod
+    def filas_para_exportar(tipo, **filtros):
+        """Devuelve (columnas, generador de filas) del reporte indicado, sin fila de totales"""
+        if tipo == 'GENERAL':
+            deudas = ReporteService.consulta_reporte_general(**filtros)
+            return ReporteService.COLUMNAS_GENERAL, ReporteService.filas_reporte_general(deudas)
+        if tipo == 'CLIENTES':
+            return ReporteService.COLUMNAS_CLIENTES, ReporteService.filas_reporte_clientes()
+        if tipo == 'ABONOS':
+            _, filas = ReporteService.consulta_reporte_abonos(**filtros)
+            return ReporteService.COLUMNAS_ABONOS, ReporteService.filas_reporte_abonos(filas)
+        if tipo == 'CAJA':
+            transacciones = ReporteService.consulta_reporte_caja(**filtros)
+            return ReporteService.COLUMNAS_CAJA, ReporteService.filas_reporte_caja(transacciones)
+        if tipo == 'ANTIGUEDAD':
+            return ReporteService.COLUMNAS_ANTIGUEDAD, ReporteService.filas_reporte_antiguedad(**filtros)
+        raise ValueError(f'Tipo de reporte desconocido: {tipo}')
+    
+    @staticmethod
+    def exportar_csv(columnas, filas):
+        """Genera el CSV línea por línea, listo para un StreamingHttpResponse"""
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow([encabezado for _, encabezado in columnas])
+        for fila in filas:
+            yield escritor.writerow(fila)
+    
+    @staticmethod
+    def _valor_json(valor):
+        """Los importes van como texto con dos decimales, sin pasar por float"""
+        if isinstance(valor, Decimal):
+            return str(valor.quantize(Decimal('0.01')))
+        raise TypeError(f'{type(valor).__name__} no se puede exportar a JSON')
+    
+    @staticmethod
+    def exportar_jsonl(columnas, filas):
+        """Genera un objeto JSON por línea (JSON Lines)"""
+        claves = [clave for clave, _ in columnas]
+        for fila in filas:
+            yield json.dumps(dict(zip(claves, fila)), ensure_ascii=False, default=ReporteService._valor_json) + '\n'
+    
+    # Trabajos en segundo plano
+    
+    GENERADORES = {
+        'GENERAL': 'generar_reporte_general',
+        'CLIENTES': 'generar_reporte_clientes',
+        'ABONOS': 'generar_reporte_abonos',
+        'CAJA': 'generar_reporte_caja',
+        'ANTIGUEDAD': 'generar_reporte_antiguedad',
+    }
+    
+    @staticmethod
+    def version_datos(tipo):
+        """Número que cambia cada vez que cambian los datos del reporte"""
+        if tipo == 'CAJA':
+            # Cada escritura de caja incrementa la versión de algún día
+            return VersionCaja.objects.aggregate(total=Sum('version'))['total'] or 0
+        return VersionCartera.actual()
+    
+    @staticmethod
+    def clave_trabajo(tipo, filtros):
+        """Hash de (tipo, filtros, versión de los datos)"""
+        contenido = json.dumps([tipo, filtros, ReporteService.version_datos(tipo)], sort_keys=True)
+        return hashlib.sha256(contenido.encode()).hexdigest()
+    
+    @staticmethod
+    def encolar_trabajo(tipo, filtros, usuario=None):
+        """
+        Crea un trabajo de reporte, o reutiliza uno con la misma clave que ya
+        esté terminado o en curso. Los trabajos abandonados se marcan antes
+        como fallidos para no reutilizarlos. Devuelve (trabajo, reutilizado).
+        """
+        clave = ReporteService.clave_trabajo(tipo, filtros)
+        ReporteService.marcar_trabajos_vencidos(TrabajoReporte.objects.filter(clave=clave))
+        
+        existente = TrabajoReporte.objects.filter(clave=clave).exclude(
+            estado='FALLIDO'
+        ).order_by('-fecha_creacion').first()
+        if existente and (existente.estado != 'COMPLETADO' or existente.archivo.storage.exists(existente.archivo.name)):
+            return existente, True
+        
+        trabajo = TrabajoReporte.objects.create(
+            tipo=tipo,
+            filtros=filtros,
+            clave=clave,
+            usuario=usuario
+        )
+        
+        if not settings.REPORTES_WORKER_EXTERNO:
+            transaction.on_commit(lambda: threading.Thread(
+                target=ReporteService._ejecutar_en_hilo,
+                args=(trabajo.id,),
+                daemon=True
+            ).start())
+        
+        return trabajo, False
+    
+    @staticmethod
+    def marcar_trabajos_vencidos(trabajos=None):
+        """
+        Marca FALLIDO los trabajos abandonados (por ejemplo, si un reinicio
+        mató el hilo que los generaba): EN_PROCESO sin latido y PENDIENTE sin
+        tomar durante REPORTES_TRABAJO_TIMEOUT segundos. Devuelve cuántos marcó.
+        """
+        ahora = timezone.now()
+        limite = ahora - timedelta(seconds=settings.REPORTES_TRABAJO_TIMEOUT)
+        sin_latido = Q(latido__lt=limite) | Q(latido__isnull=True, fecha_creacion__lt=limite)
+        
+        trabajos = TrabajoReporte.objects.all() if trabajos is None else trabajos
+        return trabajos.filter(
+            (Q(estado='EN_PROCESO') & sin_latido) | Q(estado='PENDIENTE', fecha_creacion__lt=limite)
+        ).update(
+            estado='FALLIDO',
+            error_mensaje='El trabajo se interrumpió antes de terminar. Vuelva a generar el reporte.',
+            fecha_fin=ahora
+        )
+    
+    @staticmethod
+    def _ejecutar_en_hilo(trabajo_id):
+        try:
+            ReporteService.ejecutar_trabajo(trabajo_id)
+        finally:
+            connection.close()
+    
+    @staticmethod
+    def _argumentos_generador(filtros):
+        """Convierte los filtros guardados en JSON a los argumentos del generador"""
+        argumentos = {}
+        for campo in ('fecha_inicio', 'fecha_fin', 'fecha_corte'):
+            if filtros.get(campo):
+                argumentos[campo] = date.fromisoformat(filtros[campo])
+        if filtros.get('cliente_id'):
+            argumentos['cliente_id'] = int(filtros['cliente_id'])
+        if filtros.get('usuario_id'):
+            argumentos['usuario_id'] = int(filtros['usuario_id'])
+        if filtros.get('incluir_pagadas'):
+            argumentos['incluir_pagadas'] = True
+        return argumentos
+    
+    @staticmethod
+    def ejecutar_trabajo(trabajo_id):
+        """Genera el archivo de un trabajo pendiente. Devuelve None si otro proceso ya lo tomó"""
+        tomado = TrabajoReporte.objects.filter(
+            pk=trabajo_id, estado='PENDIENTE'
+        ).update(estado='EN_PROCESO', latido=timezone.now())
+        if not tomado:
+            return None
+        
+        trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+        
+        def progreso(escritas, total):
+            # Cada avance renueva el latido, aunque no se conozca el total
+            cambios = {'latido': timezone.now()}
+            if total:
+                cambios['progreso'] = min(99, escritas * 100 // total)
+            TrabajoReporte.objects.filter(pk=trabajo_id).update(**cambios)
+        
+        try:
+            generador = getattr(ReporteService, ReporteService.GENERADORES[trabajo.tipo])
+            archivo = generador(progreso=progreso, **ReporteService._argumentos_generador(trabajo.filtros))
+            with archivo:
+                nombre = f'{trabajo.tipo.lower()}_{trabajo.clave[:16]}.xlsx'
+                trabajo.archivo.save(nombre, File(archivo), save=False)
+            trabajo.estado = 'COMPLETADO'
+            trabajo.progreso = 100
+        except Exception as e:
+            trabajo.estado = 'FALLIDO'
+            trabajo.error_mensaje = str(e)
+        
+        trabajo.fecha_fin = timezone.now()
+        trabajo.save(update_fields=['archivo', 'estado', 'progreso', 'error_mensaje', 'fecha_fin'])
+        
+        return trabajo
+    
+    @staticmethod
+    def procesar_pendientes():
+        """Ejecuta, en orden de llegada, los trabajos pendientes. Devuelve cuántos procesó"""
+        ReporteService.marcar_trabajos_vencidos()
+        procesados = 0
+        pendientes = TrabajoReporte.objects.filter(
+            estado='PENDIENTE'
+        ).order_by('fecha_creacion').values_list('id', flat=True)
         
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        for trabajo_id in list(pendientes):
+            if ReporteService.ejecutar_trabajo(trabajo_id):
+                procesados += 1
         
-        return buffer
\ No newline at end of file
+        return procesados
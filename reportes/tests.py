@@ -1,3 +1,418 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from caja.models import Transaccion, CierreCaja, TipoTransaccion
+from cartera.models import Cliente, Deuda, Abono
+
+from .models import TrabajoReporte
+from .services import LibroExcelStreaming, ReporteService
+from .views import leer_filtros
+
+
+class LibroExcelStreamingTests(TestCase):
+
+    def test_anchos_calculados_al_escribir(self):
+        libro = LibroExcelStreaming('Prueba', ['ID', 'Nombre'])
+        libro.agregar_fila([1, 'Un nombre bastante largo'])
+        libro.agregar_fila([2, 'x' * 80])
+        libro.agregar_totales('TOTAL', {2: 3})
+
+        ws = load_workbook(libro.guardar()).active
+
+        self.assertEqual(ws.title, 'Prueba')
+        self.assertEqual(ws.column_dimensions['A'].width, 7)
+        self.assertEqual(ws.column_dimensions['B'].width, LibroExcelStreaming.ANCHO_MAXIMO)
+        self.assertEqual(ws['A1'].value, 'ID')
+        self.assertTrue(ws['A1'].font.bold)
+        self.assertEqual(ws['A5'].value, 'TOTAL')
+        self.assertTrue(ws['A5'].font.bold)
+        self.assertEqual(ws['B5'].value, 3)
+
+
+class ReportesExcelTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.cliente = Cliente.objects.create(nombre='Marta', correo='marta@example.com')
+        cls.deuda = Deuda.objects.create(
+            cliente=cls.cliente, monto=Decimal('100.00'),
+            descripcion='Compresor', fecha_vencimiento=hoy - timedelta(days=3)
+        )
+        Abono.objects.create(deuda=cls.deuda, monto=Decimal('40.00'))
+        cls.staff = User.objects.create_user('contador', password='contador123', is_staff=True)
+
+    def test_reporte_general(self):
+        ws = load_workbook(ReporteService.generar_reporte_general()).active
+
+        filas = list(ws.iter_rows(values_only=True))
+        self.assertEqual(filas[1][:9], (
+            self.deuda.id, 'Marta', 'marta@example.com', 'N/A', 'Compresor',
+            100, 40, 60, 'Vencida'
+        ))
+        self.assertEqual(filas[-1][0], 'TOTALES')
+        self.assertEqual(filas[-1][5:8], (100, 40, 60))
+
+    def test_reporte_general_con_consultas_constantes(self):
+        for i in range(15):
+            deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('10.00'))
+            Abono.objects.create(deuda=deuda, monto=Decimal('5.00'))
+
+        # Una consulta para las filas y otra para los totales
+        with self.assertNumQueries(2):
+            archivo = ReporteService.generar_reporte_general(incluir_pagadas=True)
+
+        filas = list(load_workbook(archivo).active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 1 + 16 + 2)
+        self.assertEqual(filas[-1][5:8], (250, 115, 135))
+
+    def test_reporte_clientes_desde_resumen_en_una_consulta(self):
+        otro = Cliente.objects.create(nombre='Pedro', correo='pedro@example.com', telefono='555')
+        Deuda.objects.create(cliente=otro, monto=Decimal('30.00'), pagada=True)
+        Deuda.objects.create(cliente=otro, monto=Decimal('20.00'))
+        Cliente.objects.create(nombre='Sin deudas', correo='nadie@example.com')
+        # Creado en bloque: sin fila de resumen
+        sin_resumen, = Cliente.objects.bulk_create([Cliente(nombre='Importado', correo='imp@example.com')])
+        vencimiento = self.deuda.fecha_vencimiento.strftime('%Y-%m-%d')
+
+        with self.assertNumQueries(1):
+            archivo = ReporteService.generar_reporte_clientes()
+
+        filas = list(load_workbook(archivo).active.iter_rows(values_only=True))[1:]
+        self.assertEqual(filas, [
+            (self.cliente.id, 'Marta', 'marta@example.com', 'N/A', 1, 1, 100, 40, 60, vencimiento),
+            (otro.id, 'Pedro', 'pedro@example.com', '555', 2, 1, 50, 30, 20, 'N/A'),
+            (otro.id + 1, 'Sin deudas', 'nadie@example.com', 'N/A', 0, 0, 0, 0, 0, 'N/A'),
+            (sin_resumen.id, 'Importado', 'imp@example.com', 'N/A', 0, 0, 0, 0, 0, 'N/A'),
+        ])
+
+    def test_reporte_abonos_con_saldo_acumulado(self):
+        fechas = [date(2024, 1, 10), date(2024, 2, 10), date(2024, 3, 10)]
+        deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('90.00'))
+        for fecha in fechas:
+            abono = Abono.objects.create(deuda=deuda, monto=Decimal('20.00'))
+            Abono.objects.filter(pk=abono.pk).update(fecha=fecha)
+
+        with self.assertNumQueries(2):
+            archivo = ReporteService.generar_reporte_abonos(
+                fecha_inicio=date(2024, 2, 1),
+                fecha_fin=date(2024, 3, 31)
+            )
+
+        filas = list(load_workbook(archivo).active.iter_rows(values_only=True))
+        self.assertEqual([(f[4], f[5]) for f in filas[1:3]], [
+            ('2024-02-10', 50),
+            ('2024-03-10', 30),
+        ])
+        self.assertEqual(filas[-1][0], 'TOTAL ABONOS')
+        self.assertEqual(filas[-1][3], 40)
+
+    def test_descarga_se_envia_en_streaming(self):
+        self.client.force_login(self.staff)
+
+        for nombre in ('descargar_general', 'descargar_clientes', 'descargar_abonos'):
+            respuesta = self.client.get(reverse(f'reportes:{nombre}'))
+
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertTrue(respuesta.streaming)
+            self.assertIn('attachment;', respuesta['Content-Disposition'])
+            contenido = b''.join(respuesta.streaming_content)
+            self.assertTrue(contenido.startswith(b'PK'))
+
+
+class ExportacionStreamingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nombre='José', correo='jose@example.com')
+        cls.deuda = Deuda.objects.create(cliente=cls.cliente, monto=Decimal('75.50'), descripcion='Gas R-410')
+        Abono.objects.create(deuda=cls.deuda, monto=Decimal('25.50'))
+        cls.staff = User.objects.create_user('auxiliar', password='auxiliar123', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_csv_en_streaming(self):
+        respuesta = self.client.get(reverse('reportes:exportar', args=['general', 'csv']))
+
+        self.assertTrue(respuesta.streaming)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/csv'))
+        lineas = b''.join(respuesta.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lineas[0].split(',')[:3], ['ID Deuda', 'Cliente', 'Correo Cliente'])
+        self.assertEqual(lineas[1].split(',')[1:8], [
+            'José', 'jose@example.com', 'N/A', 'Gas R-410', '75.50', '25.50', '50.00'
+        ])
+        self.assertEqual(len(lineas), 2)
+
+    def test_jsonl_en_streaming(self):
+        respuesta = self.client.get(
+            reverse('reportes:exportar', args=['abonos', 'jsonl']),
+            {'fecha_inicio': '2000-01-01'}
+        )
+
+        lineas = b''.join(respuesta.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 1)
+        abono = json.loads(lineas[0])
+        self.assertEqual(abono['cliente'], 'José')
+        self.assertEqual(abono['monto_abono'], '25.50')
+        self.assertEqual(abono['saldo_tras_abono'], '50.00')
+
+    async def test_bajo_asgi_el_contenido_es_asincrono(self):
+        await sync_to_async(self.async_client.force_login)(self.staff)
+
+        respuesta = await self.async_client.get(reverse('reportes:exportar', args=['clientes', 'csv']))
+
+        self.assertTrue(respuesta.is_async)
+        contenido = b''.join([parte async for parte in respuesta.streaming_content])
+        self.assertIn('José'.encode(), contenido)
+
+    def test_generador_de_filas_consulta_una_vez(self):
+        columnas, filas = ReporteService.filas_para_exportar('CLIENTES')
+
+        with self.assertNumQueries(1):
+            contenido = ''.join(ReporteService.exportar_csv(columnas, filas))
+
+        self.assertIn('José', contenido)
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(reverse('reportes:exportar', args=['general', 'pdf']))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class ReporteCajaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cajero = User.objects.create_user('cajero1', password='cajero123')
+        cls.otro = User.objects.create_user('cajero2', password='cajero123')
+        dia1, dia2 = date(2024, 5, 1), date(2024, 5, 2)
+        for fecha, tipo, monto, usuario in [
+            (dia1, TipoTransaccion.VENTA_FACTURADA, '100.00', cls.cajero),
+            (dia1, TipoTransaccion.VENTA_NO_FACTURADA, '40.00', cls.cajero),
+            (dia1, TipoTransaccion.INGRESO_OTRO, '5.00', cls.otro),
+            (dia2, TipoTransaccion.VENTA_FACTURADA, '60.00', cls.cajero),
+            (date(2024, 6, 1), TipoTransaccion.VENTA_FACTURADA, '999.00', cls.cajero),
+        ]:
+            Transaccion.objects.create(
+                fecha=fecha, tipo=tipo, monto=Decimal(monto),
+                descripcion='Venta', usuario=usuario
+            )
+        CierreCaja.objects.create(
+            fecha=dia1, total_calculado=Decimal('145.00'), total_fisico=Decimal('140.00'),
+            diferencia=Decimal('-5.00'), cerrado=True
+        )
+
+    def test_resumen_diario_y_transacciones(self):
+        with self.assertNumQueries(3):
+            archivo = ReporteService.generar_reporte_caja(
+                fecha_inicio=date(2024, 5, 1), fecha_fin=date(2024, 5, 31)
+            )
+
+        libro = load_workbook(archivo)
+        self.assertEqual(libro.sheetnames, ['Resumen Diario', 'Transacciones'])
+
+        resumen = list(libro['Resumen Diario'].iter_rows(values_only=True))
+        self.assertEqual(resumen[1], ('2024-05-01', 100, 40, 5, 145, 3, 'Cerrada', 140, -5))
+        self.assertEqual(resumen[2][:7], ('2024-05-02', 60, 0, 0, 60, 1, 'Sin cierre'))
+        self.assertEqual(resumen[-1][:6], ('TOTALES', 160, 40, 5, 205, 4))
+
+        transacciones = list(libro['Transacciones'].iter_rows(values_only=True))
+        self.assertEqual(len(transacciones), 5)
+        self.assertEqual(transacciones[1][2:4], ('Venta Facturada', 100))
+
+    def test_filtro_por_usuario(self):
+        archivo = ReporteService.generar_reporte_caja(usuario_id=self.otro.id)
+
+        resumen = list(load_workbook(archivo)['Resumen Diario'].iter_rows(values_only=True))
+        self.assertEqual(resumen[1][:6], ('2024-05-01', 0, 0, 5, 5, 1))
+
+    def test_exportacion_csv(self):
+        staff = User.objects.create_user('contadora', password='contadora123', is_staff=True)
+        self.client.force_login(staff)
+
+        respuesta = self.client.get(
+            reverse('reportes:exportar', args=['caja', 'csv']),
+            {'fecha_inicio': '2024-05-02', 'usuario_id': self.cajero.id}
+        )
+
+        lineas = b''.join(respuesta.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 3)
+        self.assertTrue(lineas[1].startswith(f'{Transaccion.objects.get(fecha=date(2024, 5, 2)).id},2024-05-02,'))
+
+
+class ReporteAntiguedadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.corte = date(2024, 6, 30)
+        cls.ana = Cliente.objects.create(nombre='Ana', correo='ana@example.com')
+        cls.beto = Cliente.objects.create(nombre='Beto', correo='beto@example.com')
+        for cliente, monto, dias_vencidos in [
+            (cls.ana, '10.00', None),
+            (cls.ana, '20.00', 0),
+            (cls.ana, '30.00', 30),
+            (cls.ana, '40.00', 31),
+            (cls.beto, '50.00', 90),
+            (cls.beto, '60.00', 91),
+        ]:
+            Deuda.objects.create(
+                cliente=cliente, monto=Decimal(monto),
+                fecha_vencimiento=None if dias_vencidos is None else cls.corte - timedelta(days=dias_vencidos)
+            )
+        # Las pagadas no cuentan
+        Deuda.objects.create(cliente=cls.beto, monto=Decimal('70.00'), pagada=True,
+                             fecha_vencimiento=cls.corte - timedelta(days=200))
+
+    def test_tramos_por_cliente_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            archivo = ReporteService.generar_reporte_antiguedad(fecha_corte=self.corte)
+
+        filas = list(load_workbook(archivo).active.iter_rows(values_only=True))
+        self.assertEqual(filas[0][2:], ('Por Vencer', '1-30 Días', '31-60 Días', '61-90 Días', 'Más de 90 Días', 'Saldo Total'))
+        self.assertEqual(filas[1][1:], ('Ana', 30, 30, 40, 0, 0, 100))
+        self.assertEqual(filas[2][1:], ('Beto', 0, 0, 0, 50, 60, 110))
+        self.assertEqual(filas[-1], ('TOTALES', None, 30, 30, 40, 50, 60, 210))
+
+    def test_exportacion_jsonl_con_fecha_de_corte(self):
+        staff = User.objects.create_user('gerente', password='gerente123', is_staff=True)
+        self.client.force_login(staff)
+
+        respuesta = self.client.get(
+            reverse('reportes:exportar', args=['antiguedad', 'jsonl']),
+            {'fecha_corte': '2024-07-30'}
+        )
+
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode('utf-8').splitlines()]
+        # Treinta días después, cada deuda vencida pasa al tramo siguiente
+        self.assertEqual(filas[0]['de_31_a_60'], '30.00')
+        self.assertEqual(filas[0]['de_61_a_90'], '40.00')
+        self.assertEqual(filas[1]['mas_de_90'], '110.00')
+
+
+class TrabajosReporteTests(TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(REPORTES_DIR=self.directorio, REPORTES_WORKER_EXTERNO=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.cliente = Cliente.objects.create(nombre='Rosa', correo='rosa@example.com')
+        self.deuda = Deuda.objects.create(cliente=self.cliente, monto=Decimal('80.00'))
+        self.staff = User.objects.create_user('gerente', password='gerente123', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_encolar_procesar_y_descargar(self):
+        respuesta = self.client.post(reverse('reportes:crear_trabajo'), {
+            'tipo': 'GENERAL', 'fecha_inicio': '2020-01-01', 'incluir_pagadas': 'on'
+        })
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = respuesta.json()
+        self.assertEqual(trabajo['estado'], 'PENDIENTE')
+        self.assertIsNone(trabajo['url_descarga'])
+
+        call_command('procesar_reportes', '--una-vez', stdout=StringIO())
+
+        trabajo = self.client.get(trabajo['url_estado']).json()
+        self.assertEqual(trabajo['estado'], 'COMPLETADO')
+        self.assertEqual(trabajo['progreso'], 100)
+
+        descarga = self.client.get(trabajo['url_descarga'])
+        self.assertTrue(descarga.streaming)
+        contenido = BytesIO(b''.join(descarga.streaming_content))
+        filas = list(load_workbook(contenido).active.iter_rows(values_only=True))
+        self.assertEqual(filas[1][1], 'Rosa')
+
+    def test_reutiliza_resultado_hasta_que_cambian_los_datos(self):
+        primero, reutilizado = ReporteService.encolar_trabajo('CLIENTES', {})
+        self.assertFalse(reutilizado)
+        ReporteService.ejecutar_trabajo(primero.id)
+
+        segundo, reutilizado = ReporteService.encolar_trabajo('CLIENTES', {})
+        self.assertTrue(reutilizado)
+        self.assertEqual(segundo.id, primero.id)
+
+        # Otros filtros u otra versión de la cartera generan un trabajo nuevo
+        _, reutilizado = ReporteService.encolar_trabajo('ABONOS', {'fecha_inicio': '2024-01-01'})
+        self.assertFalse(reutilizado)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Abono.objects.create(deuda=self.deuda, monto=Decimal('10.00'))
+        tercero, reutilizado = ReporteService.encolar_trabajo('CLIENTES', {})
+        self.assertFalse(reutilizado)
+        self.assertNotEqual(tercero.clave, primero.clave)
+
+    def test_reporte_de_caja_usa_la_version_de_caja(self):
+        primero, _ = ReporteService.encolar_trabajo('CAJA', {})
+        ReporteService.ejecutar_trabajo(primero.id)
+
+        Abono.objects.create(deuda=self.deuda, monto=Decimal('10.00'))
+        _, reutilizado = ReporteService.encolar_trabajo('CAJA', {})
+        self.assertTrue(reutilizado)
+
+        Transaccion.objects.create(monto=Decimal('10.00'), descripcion='Venta', usuario=self.staff)
+        _, reutilizado = ReporteService.encolar_trabajo('CAJA', {})
+        self.assertFalse(reutilizado)
+
+    def test_trabajo_tomado_una_sola_vez(self):
+        trabajo, _ = ReporteService.encolar_trabajo('CLIENTES', {})
+
+        self.assertIsNotNone(ReporteService.ejecutar_trabajo(trabajo.id))
+        self.assertIsNone(ReporteService.ejecutar_trabajo(trabajo.id))
+
+    def test_trabajo_abandonado_no_se_reutiliza(self):
+        perdido, _ = ReporteService.encolar_trabajo('CLIENTES', {})
+        hace_rato = timezone.now() - timedelta(seconds=settings.REPORTES_TRABAJO_TIMEOUT + 1)
+        TrabajoReporte.objects.filter(pk=perdido.pk).update(estado='EN_PROCESO', latido=hace_rato)
+
+        estado = self.client.get(reverse('reportes:estado_trabajo', args=[perdido.id])).json()
+        self.assertEqual(estado['estado'], 'FALLIDO')
+        self.assertIn('interrumpió', estado['error'])
+
+        nuevo, reutilizado = ReporteService.encolar_trabajo('CLIENTES', {})
+        self.assertFalse(reutilizado)
+
+        # Un pendiente que nadie tomó a tiempo tampoco se reutiliza
+        TrabajoReporte.objects.filter(pk=nuevo.pk).update(fecha_creacion=hace_rato)
+        _, reutilizado = ReporteService.encolar_trabajo('CLIENTES', {})
+        self.assertFalse(reutilizado)
+
+        # Con latido reciente sigue en curso
+        en_curso, _ = ReporteService.encolar_trabajo('ABONOS', {})
+        TrabajoReporte.objects.filter(pk=en_curso.pk).update(
+            estado='EN_PROCESO', fecha_creacion=hace_rato, latido=timezone.now()
+        )
+        self.assertEqual(ReporteService.marcar_trabajos_vencidos(), 0)
+
+    def test_clave_del_reporte_general_incluye_el_dia(self):
+        filtros = leer_filtros({}, 'GENERAL')
+        self.assertEqual(filtros['dia'], timezone.localdate().isoformat())
+
+        manana = {**filtros, 'dia': (timezone.localdate() + timedelta(days=1)).isoformat()}
+        self.assertNotEqual(
+            ReporteService.clave_trabajo('GENERAL', filtros),
+            ReporteService.clave_trabajo('GENERAL', manana)
+        )
+
+    def test_filtros_invalidos(self):
+        respuesta = self.client.post(reverse('reportes:crear_trabajo'), {
+            'tipo': 'GENERAL', 'fecha_inicio': '31/12/2024'
+        })
+        self.assertEqual(respuesta.status_code, 400)
+
+        respuesta = self.client.post(reverse('reportes:crear_trabajo'), {'tipo': 'OTRO'})
+        self.assertEqual(respuesta.status_code, 400)
@@ -8,4 +8,10 @@ urlpatterns = [
     path('descargar/general/', views.descargar_reporte_general, name='descargar_general'),
     path('descargar/clientes/', views.descargar_reporte_clientes, name='descargar_clientes'),
     path('descargar/abonos/', views.descargar_reporte_abonos, name='descargar_abonos'),
+    path('descargar/caja/', views.descargar_reporte_caja, name='descargar_caja'),
+    path('descargar/antiguedad/', views.descargar_reporte_antiguedad, name='descargar_antiguedad'),
+    path('exportar/<str:tipo>/<str:formato>/', views.exportar_reporte, name='exportar'),
+    path('trabajos/', views.crear_trabajo_reporte, name='crear_trabajo'),
+    path('trabajos/<int:trabajo_id>/', views.estado_trabajo_reporte, name='estado_trabajo'),
+    path('trabajos/<int:trabajo_id>/descargar/', views.descargar_trabajo_reporte, name='descargar_trabajo'),
 ]
\ No newline at end of file
@@ -1,25 +1,46 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 
 # Create your views here.
 
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse
+from django.contrib.auth.models import User
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from datetime import datetime, timedelta
+from .models import TrabajoReporte
 from .services import ReporteService
 from cartera.models import Cliente
+from almacen_refrigas.streaming import contenido_streaming
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
 def es_staff(user):
     return user.is_staff
 
+def respuesta_excel(request, archivo, prefijo):
+    """Envía el archivo temporal por partes; FileResponse lo cierra al terminar"""
+    filename = f'{prefijo}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    response = FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=filename,
+        content_type=CONTENT_TYPE_EXCEL
+    )
+    response.streaming_content = contenido_streaming(request, response.streaming_content)
+    return response
+
 @login_required
 @user_passes_test(es_staff)
 def generar_reporte_view(request):
     """Vista principal para generar reportes con filtros"""
     clientes = Cliente.objects.all().order_by('nombre')
+    usuarios = User.objects.filter(is_active=True).order_by('username')
     
     contexto = {
         'clientes': clientes,
+        'usuarios': usuarios,
         'fecha_actual': timezone.now().date()
     }
     
@@ -40,38 +61,22 @@ def descargar_reporte_general(request):
     if fecha_fin:
         fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
     
-    buffer = ReporteService.generar_reporte_general(
+    archivo = ReporteService.generar_reporte_general(
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
         cliente_id=cliente_id,
         incluir_pagadas=incluir_pagadas
     )
     
-    filename = f'reporte_general_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    return respuesta_excel(request, archivo, 'reporte_general')
 
 @login_required
 @user_passes_test(es_staff)
 def descargar_reporte_clientes(request):
     """Descarga el reporte de clientes en Excel"""
-    buffer = ReporteService.generar_reporte_clientes()
+    archivo = ReporteService.generar_reporte_clientes()
     
-    filename = f'reporte_clientes_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    return respuesta_excel(request, archivo, 'reporte_clientes')
 
 @login_required
 @user_passes_test(es_staff)
@@ -85,17 +90,151 @@ def descargar_reporte_abonos(request):
     if fecha_fin:
         fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
     
-    buffer = ReporteService.generar_reporte_abonos(
+    archivo = ReporteService.generar_reporte_abonos(
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin
     )
     
-    filename = f'reporte_abonos_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    return respuesta_excel(request, archivo, 'reporte_abonos')
+
+@login_required
+@user_passes_test(es_staff)
+def descargar_reporte_caja(request):
+    """Descarga el reporte de caja en Excel con filtros de fecha y usuario"""
+    try:
+        filtros = leer_filtros(request.GET, 'CAJA')
+    except ValueError:
+        return HttpResponseBadRequest('Filtros inválidos')
+    
+    archivo = ReporteService.generar_reporte_caja(**ReporteService._argumentos_generador(filtros))
+    
+    return respuesta_excel(request, archivo, 'reporte_caja')
+
+@login_required
+@user_passes_test(es_staff)
+def descargar_reporte_antiguedad(request):
+    """Descarga la antigüedad de cartera en Excel a la fecha de corte indicada"""
+    try:
+        filtros = leer_filtros(request.GET, 'ANTIGUEDAD')
+    except ValueError:
+        return HttpResponseBadRequest('Filtros inválidos')
+    
+    archivo = ReporteService.generar_reporte_antiguedad(**ReporteService._argumentos_generador(filtros))
+    
+    return respuesta_excel(request, archivo, 'reporte_antiguedad')
+
+# EXPORTACIÓN CSV / JSON LINES
+
+FORMATOS_EXPORTACION = {
+    'csv': ('text/csv; charset=utf-8', ReporteService.exportar_csv),
+    'jsonl': ('application/x-ndjson; charset=utf-8', ReporteService.exportar_jsonl),
+}
+
+@login_required
+@user_passes_test(es_staff)
+def exportar_reporte(request, tipo, formato):
+    """Exporta un reporte en CSV o JSONL, enviado fila por fila mientras se lee la base de datos"""
+    tipo = tipo.upper()
+    if tipo not in dict(TrabajoReporte.TIPO_CHOICES) or formato not in FORMATOS_EXPORTACION:
+        raise Http404('Reporte no disponible')
+    
+    try:
+        filtros = leer_filtros(request.GET, tipo)
+    except ValueError:
+        return HttpResponseBadRequest('Filtros inválidos')
+    
+    columnas, filas = ReporteService.filas_para_exportar(
+        tipo, **ReporteService._argumentos_generador(filtros)
+    )
+    content_type, exportador = FORMATOS_EXPORTACION[formato]
     
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    filename = f'reporte_{tipo.lower()}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
+    response = StreamingHttpResponse(
+        contenido_streaming(request, exportador(columnas, filas)),
+        content_type=content_type
     )
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
-    return response
\ No newline at end of file
+    return response
+
+# TRABAJOS EN SEGUNDO PLANO
+
+def leer_filtros(datos, tipo):
+    """Filtros normalizados que aplican al tipo de reporte; forman parte de la clave del trabajo"""
+    filtros = {}
+    
+    if tipo in ('GENERAL', 'ABONOS', 'CAJA'):
+        for campo in ('fecha_inicio', 'fecha_fin'):
+            if datos.get(campo):
+                filtros[campo] = datetime.strptime(datos[campo], '%Y-%m-%d').date().isoformat()
+    
+    if tipo == 'GENERAL':
+        # El estado "Vencida" y los días vencidos dependen del día de generación
+        filtros['dia'] = timezone.localdate().isoformat()
+        if datos.get('cliente_id'):
+            filtros['cliente_id'] = int(datos['cliente_id'])
+        if datos.get('incluir_pagadas') == 'on':
+            filtros['incluir_pagadas'] = True
+    
+    if tipo == 'CAJA' and datos.get('usuario_id'):
+        filtros['usuario_id'] = int(datos['usuario_id'])
+    
+    # La antigüedad depende del día: la fecha de corte siempre forma parte de la clave
+    if tipo == 'ANTIGUEDAD':
+        fecha_corte = timezone.now().date()
+        if datos.get('fecha_corte'):
+            fecha_corte = datetime.strptime(datos['fecha_corte'], '%Y-%m-%d').date()
+        filtros['fecha_corte'] = fecha_corte.isoformat()
+    
+    return filtros
+
+def trabajo_a_json(trabajo):
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'error': trabajo.error_mensaje,
+        'url_estado': reverse('reportes:estado_trabajo', args=[trabajo.id]),
+        'url_descarga': (
+            reverse('reportes:descargar_trabajo', args=[trabajo.id])
+            if trabajo.estado == 'COMPLETADO' else None
+        ),
+    }
+
+@login_required
+@user_passes_test(es_staff)
+@require_POST
+def crear_trabajo_reporte(request):
+    """Encola un reporte; si ya existe uno igual con los mismos datos se reutiliza"""
+    tipo = request.POST.get('tipo')
+    if tipo not in dict(TrabajoReporte.TIPO_CHOICES):
+        return JsonResponse({'error': 'Tipo de reporte inválido'}, status=400)
+    
+    try:
+        filtros = leer_filtros(request.POST, tipo)
+    except ValueError:
+        return JsonResponse({'error': 'Filtros inválidos'}, status=400)
+    
+    trabajo, reutilizado = ReporteService.encolar_trabajo(tipo, filtros, request.user)
+    
+    return JsonResponse(trabajo_a_json(trabajo), status=200 if reutilizado else 202)
+
+@login_required
+@user_passes_test(es_staff)
+def estado_trabajo_reporte(request, trabajo_id):
+    """Estado y progreso de un trabajo, para consultar periódicamente"""
+    ReporteService.marcar_trabajos_vencidos(TrabajoReporte.objects.filter(pk=trabajo_id))
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id)
+    return JsonResponse(trabajo_a_json(trabajo))
+
+@login_required
+@user_passes_test(es_staff)
+def descargar_trabajo_reporte(request, trabajo_id):
+    """Descarga el archivo ya generado de un trabajo completado"""
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id, estado='COMPLETADO')
+    
+    if not trabajo.archivo or not trabajo.archivo.storage.exists(trabajo.archivo.name):
+        raise Http404('El archivo del reporte ya no existe')
+    
+    return respuesta_excel(request, trabajo.archivo.open('rb'), f'reporte_{trabajo.tipo.lower()}')
\ No newline at end of file